@@ -3,8 +3,57 @@
 Script to add more doctors to the medical scheduling system
 """
 
+import os
 import sqlite3
-from datetime import datetime
+
+# Additional doctors to add (simplified for existing table structure)
+NEW_DOCTORS = (
+    # Allergy & Immunology (additional)
+    ("Dr. Sarah Thompson", "Allergy & Immunology"),
+    ("Dr. James Wilson", "Allergy & Immunology"),
+    
+    # Internal Medicine
+    ("Dr. Maria Garcia", "Internal Medicine"),
+    ("Dr. Robert Chen", "Internal Medicine"),
+    ("Dr. Lisa Anderson", "Internal Medicine"),
+    
+    # Dermatology
+    ("Dr. Jennifer Brown", "Dermatology"),
+    ("Dr. David Lee", "Dermatology"),
+    
+    # Pulmonology
+    ("Dr. Amanda White", "Pulmonology"),
+    ("Dr. Kevin Johnson", "Pulmonology"),
+    
+    # Rheumatology
+    ("Dr. Rachel Davis", "Rheumatology"),
+    ("Dr. Thomas Miller", "Rheumatology"),
+    
+    # ENT (Ear, Nose, Throat)
+    ("Dr. Michelle Taylor", "ENT (Otolaryngology)"),
+    ("Dr. Christopher Moore", "ENT (Otolaryngology)"),
+    
+    # Family Medicine
+    ("Dr. Patricia Clark", "Family Medicine"),
+    ("Dr. Daniel Martinez", "Family Medicine"),
+    ("Dr. Sandra Lewis", "Family Medicine"),
+    
+    # Pediatric Allergy
+    ("Dr. Emily Rodriguez", "Pediatric Allergy"),
+    ("Dr. Mark Hall", "Pediatric Allergy"),
+    
+    # Cardiology
+    ("Dr. Steven Young", "Cardiology"),
+    ("Dr. Nancy King", "Cardiology"),
+    
+    # Gastroenterology
+    ("Dr. Andrew Scott", "Gastroenterology"),
+    ("Dr. Jennifer Green", "Gastroenterology"),
+    
+    # Endocrinology
+    ("Dr. William Adams", "Endocrinology"),
+    ("Dr. Barbara Baker", "Endocrinology"),
+)
 
 def add_more_doctors():
     """Add additional doctors to the system"""
@@ -12,90 +61,76 @@ def add_more_doctors():
     print("🏥 Adding More Doctors to MediCare System")
     print("=" * 50)
     
-    conn = sqlite3.connect('data/medical_scheduler.db')
+    os.makedirs('data', exist_ok=True)
+    
+    # Autocommit mode so the inserts below run in one explicit transaction;
+    # a larger statement cache keeps the prepared INSERT hot, and shared cache lets
+    # repeat calls from a long-running process reuse the page cache
+    conn = sqlite3.connect(
+        'file:data/medical_scheduler.db?cache=shared',
+        uri=True,
+        isolation_level=None,
+        cached_statements=256,
+    )
     cursor = conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
     
     # First, check current doctors
-    cursor.execute("SELECT doctor_id, doctor_name, specialty FROM doctors")
+    cursor.execute("SELECT doctor_name, specialty FROM doctors")
     current_doctors = cursor.fetchall()
     
     print("📋 Current Doctors:")
-    for doctor in current_doctors:
-        print(f"   - Dr. {doctor[1]} ({doctor[2]})")
+    for doctor_name, specialty in current_doctors:
+        print(f"   - Dr. {doctor_name} ({specialty})")
     
     print(f"\nTotal current doctors: {len(current_doctors)}")
     
-    # Additional doctors to add (simplified for existing table structure)
-    new_doctors = [
-        # Allergy & Immunology (additional)
-        ("Dr. Sarah Thompson", "Allergy & Immunology"),
-        ("Dr. James Wilson", "Allergy & Immunology"),
-        
-        # Internal Medicine
-        ("Dr. Maria Garcia", "Internal Medicine"),
-        ("Dr. Robert Chen", "Internal Medicine"),
-        ("Dr. Lisa Anderson", "Internal Medicine"),
-        
-        # Dermatology
-        ("Dr. Jennifer Brown", "Dermatology"),
-        ("Dr. David Lee", "Dermatology"),
-        
-        # Pulmonology
-        ("Dr. Amanda White", "Pulmonology"),
-        ("Dr. Kevin Johnson", "Pulmonology"),
-        
-        # Rheumatology
-        ("Dr. Rachel Davis", "Rheumatology"),
-        ("Dr. Thomas Miller", "Rheumatology"),
-        
-        # ENT (Ear, Nose, Throat)
-        ("Dr. Michelle Taylor", "ENT (Otolaryngology)"),
-        ("Dr. Christopher Moore", "ENT (Otolaryngology)"),
-        
-        # Family Medicine
-        ("Dr. Patricia Clark", "Family Medicine"),
-        ("Dr. Daniel Martinez", "Family Medicine"),
-        ("Dr. Sandra Lewis", "Family Medicine"),
-        
-        # Pediatric Allergy
-        ("Dr. Emily Rodriguez", "Pediatric Allergy"),
-        ("Dr. Mark Hall", "Pediatric Allergy"),
-        
-        # Cardiology
-        ("Dr. Steven Young", "Cardiology"),
-        ("Dr. Nancy King", "Cardiology"),
-        
-        # Gastroenterology
-        ("Dr. Andrew Scott", "Gastroenterology"),
-        ("Dr. Jennifer Green", "Gastroenterology"),
-        
-        # Endocrinology
-        ("Dr. William Adams", "Endocrinology"),
-        ("Dr. Barbara Baker", "Endocrinology"),
-    ]
-    
-    print(f"\n➕ Adding {len(new_doctors)} new doctors...")
-    
-    for doctor_name, specialty in new_doctors:
-        try:
-            cursor.execute("""
-                INSERT INTO doctors (doctor_name, specialty)
-                VALUES (?, ?)
-            """, (doctor_name, specialty))
-            print(f"   ✅ Added: {doctor_name} ({specialty})")
-        except Exception as e:
-            print(f"   ❌ Error adding {doctor_name}: {e}")
+    print(f"\n➕ Adding {len(NEW_DOCTORS)} new doctors...")
     
-    conn.commit()
+    # Unique (name, specialty) lets SQLite skip doctors that are already present,
+    # so re-running the script doesn't pile up duplicate rows. Runs before this
+    # change may have left duplicates, which would block the index; appointments
+    # can point at any copy, so list them for a manual merge rather than deleting
+    cursor.execute("""
+        SELECT doctor_name, specialty, GROUP_CONCAT(COALESCE(doctor_id, 'rowid ' || rowid), ', ')
+        FROM doctors
+        GROUP BY doctor_name, specialty
+        HAVING COUNT(*) > 1
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        print("   ❌ Duplicate doctors found; merge them before re-running:")
+        for doctor_name, specialty, doctor_ids in duplicates:
+            print(f"      - {doctor_name} ({specialty}): IDs {doctor_ids}")
+        conn.close()
+        return
     
-    # Show final count
-    cursor.execute("SELECT COUNT(*) FROM doctors")
-    total_doctors = cursor.fetchone()[0]
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_doctors_name_spec
+            ON doctors (doctor_name, specialty)
+        """)
+        
+        cursor.executemany("""
+            INSERT INTO doctors (doctor_name, specialty)
+            VALUES (?, ?)
+            ON CONFLICT (doctor_name, specialty) DO NOTHING
+        """, NEW_DOCTORS)
+        added = cursor.rowcount
+        cursor.execute("COMMIT")
+    except Exception as e:
+        cursor.execute("ROLLBACK")
+        print(f"   ❌ Error adding doctors: {e}")
+        conn.close()
+        return
     
-    print(f"\n🎉 Successfully updated doctor database!")
-    print(f"📊 Total doctors now: {total_doctors}")
+    print(f"   ✅ Added: {added} doctors ({len(NEW_DOCTORS) - added} already present)")
     
-    # Show doctors by specialty
+    # Show doctors by specialty; the total falls out of the same query
     cursor.execute("""
         SELECT specialty, COUNT(*) as count 
         FROM doctors 
@@ -103,6 +138,10 @@ def add_more_doctors():
         ORDER BY count DESC
     """)
     specialties = cursor.fetchall()
+    total_doctors = sum(count for _, count in specialties)
+    
+    print(f"\n🎉 Successfully updated doctor database!")
+    print(f"📊 Total doctors now: {total_doctors}")
     
     print(f"\n📋 Doctors by Specialty:")
     for specialty, count in specialties:
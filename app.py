@@ -3,14 +3,21 @@ import pandas as pd
 import sqlite3
 import uuid
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 import os
 import json
+import html
+import csv
+import io
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from medical_agent_simple import EnhancedMedicalAgent
 from communication import CommunicationManager
 from database_manager import DatabaseManager
+from automated_reminder_system import AutomatedReminderSystem
 
 # Calendar integration
 try:
@@ -28,7 +35,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #1e3c72 0%, #2a5298 100%);
@@ -71,32 +78,158 @@ st.markdown("""
         box-shadow: 0 2px 4px rgba(0,0,0,0.1);
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# CSS class per chat role
+MESSAGE_CLASSES = {'user': 'user-message', 'assistant': 'bot-message'}
+
+HEADER_HTML = """
+<div class="main-header">
+    <h1>🏥 MediCare Allergy & Wellness Center</h1>
+    <h3 style="color: white; text-align: center; margin: 0;">AI-Powered Appointment Scheduling Assistant</h3>
+</div>
+"""
+
+def render_messages_html(messages):
+    """Render chat messages to a single HTML string"""
+    return "".join(
+        f'<div class="{MESSAGE_CLASSES.get(m["role"], "bot-message")}">{html.escape(m["content"])}</div>'
+        for m in messages
+    )
+
+@st.cache_resource
+def get_comm_manager():
+    """Process-wide CommunicationManager (holds only config and the Twilio client)"""
+    return CommunicationManager()
+
+@st.cache_resource
+def get_db_manager():
+    """Process-wide DatabaseManager so the schema check runs once per process"""
+    return DatabaseManager()
+
+@st.cache_resource
+def get_reminder_system():
+    """Process-wide AutomatedReminderSystem for the Admin Panel test buttons"""
+    return AutomatedReminderSystem()
+
+@st.cache_resource
+def get_comm_executor():
+    """Background workers for confirmation emails/SMS so booking doesn't block the UI"""
+    return ThreadPoolExecutor(max_workers=4)
 
 # Initialize session state
 if 'messages' not in st.session_state:
     st.session_state.messages = []
+if 'messages_html' not in st.session_state:
+    st.session_state.messages_html = render_messages_html(st.session_state.messages)
 if 'agent' not in st.session_state:
+    # The agent keeps per-conversation context, so it stays per session
     st.session_state.agent = EnhancedMedicalAgent()
 if 'comm_manager' not in st.session_state:
-    st.session_state.comm_manager = CommunicationManager()
+    st.session_state.comm_manager = get_comm_manager()
 if 'db_manager' not in st.session_state:
-    st.session_state.db_manager = DatabaseManager()
+    st.session_state.db_manager = get_db_manager()
 if 'current_step' not in st.session_state:
     st.session_state.current_step = 'greeting'
 if 'patient_data' not in st.session_state:
     st.session_state.patient_data = {}
 if 'appointment_data' not in st.session_state:
     st.session_state.appointment_data = {}
+if 'pending_comms' not in st.session_state:
+    st.session_state.pending_comms = []
+
+@st.cache_resource
+def _conn_local():
+    """Per-thread connection holder, kept across reruns (module globals are not)"""
+    return threading.local()
+
+def get_conn():
+    """This thread's SQLite connection, opened and tuned on first use and reused across reruns"""
+    local = _conn_local()
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect("data/medical_scheduler.db", isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+        _ensure_indexes(conn)
+        local.conn = conn
+    return conn
+
+@st.cache_resource
+def _ensure_indexes(_conn):
+    """Create the indexes behind the appointment date filters, joins and patient-type grouping, once per process"""
+    _conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_appt_date ON appointments(appointment_date);
+        CREATE INDEX IF NOT EXISTS idx_appt_date_time ON appointments(appointment_date, appointment_time);
+        CREATE INDEX IF NOT EXISTS idx_appt_patient ON appointments(patient_id);
+        CREATE INDEX IF NOT EXISTS idx_appt_doctor ON appointments(doctor_id);
+        CREATE INDEX IF NOT EXISTS idx_patients_new ON patients(is_new_patient);
+        CREATE INDEX IF NOT EXISTS ix_appt_status_id ON appointments(status, appointment_id DESC);
+    """)
+
+@st.cache_data(ttl=60)
+def _quick_stats(today):
+    """Sidebar counts (patients, today's appointments, doctors) in one round trip"""
+    conn = get_conn()
+    return conn.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM patients) AS total_patients,
+            (SELECT COUNT(*) FROM appointments WHERE appointment_date = ?) AS today_appointments,
+            (SELECT COUNT(*) FROM doctors) AS total_doctors
+    """, (today,)).fetchone()
+
+# Background color per appointment status in the Full Calendar View
+EVENT_STATUS_COLORS = {'confirmed': '#d4edda', 'pending': '#fff3cd'}
+
+# Layout of the Doctor Availability slot grid
+SLOT_GRID_STYLE = "display: grid; grid-template-columns: repeat(4, 1fr); gap: 6px; margin-bottom: 10px;"
+SLOT_CHIP_STYLE = "border: 1px solid #dee2e6; border-radius: 5px; padding: 4px 8px; text-align: center;"
+
+# Rows per page on the Appointments screen
+APPOINTMENTS_PAGE_SIZE = 50
+
+# Reminder System Status in one round trip: pending reminders, reminders sent today,
+# upcoming appointments (next 7 days) and whether any confirmed appointment exists for
+# the manual test. Kept as a constant so every rerun hits the connection's statement cache.
+# Each count filters on plain column ranges so it can be answered from the status indexes.
+_SQL_REMINDER_STATUS = """
+    WITH r AS (
+        SELECT 
+            (SELECT COUNT(*) FROM reminders
+             WHERE status = 'pending' AND scheduled_time <= datetime('now')) AS pending,
+            (SELECT COUNT(*) FROM reminders
+             WHERE status = 'sent'
+             AND sent_time >= datetime('now', 'start of day')
+             AND sent_time < datetime('now', 'start of day', '+1 day')) AS sent_today
+    ), a AS (
+        SELECT COUNT(*) AS upcoming
+        FROM appointments 
+        WHERE appointment_date BETWEEN DATE('now') AND DATE('now', '+7 days')
+        AND status = 'confirmed'
+    ), c AS (
+        SELECT EXISTS (SELECT 1 FROM appointments WHERE status = 'confirmed') AS has_confirmed
+    )
+    SELECT r.pending, r.sent_today, a.upcoming, c.has_confirmed FROM r, a, c
+"""
+
+# Anything that isn't part of a phone number (digits, parentheses, dashes, dots, spaces)
+_PHONE_STRIP_RE = re.compile(r'[^\d()\-. ]')
+
+def _inject_page_chrome():
+    """Emit the custom CSS and header; every rerun must draw them again"""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
+
+# Lead-in phrases stripped from name input, and the name tokens left over
+_NAME_PREFIX_RE = re.compile(r'\b(?:my name is|i am|this is)\b', re.IGNORECASE)
+_NAME_TOKEN_RE = re.compile(r"[^\W\d_]+(?:['\-][^\W\d_]+)*")
 
 def main():
-    # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🏥 MediCare Allergy & Wellness Center</h1>
-        <h3 style="color: white; text-align: center; margin: 0;">AI-Powered Appointment Scheduling Assistant</h3>
-    </div>
-    """, unsafe_allow_html=True)
+    # CSS and header
+    _inject_page_chrome()
     
     # Sidebar
     with st.sidebar:
@@ -111,29 +244,19 @@ def main():
         # Quick stats
         st.subheader("📈 Quick Stats")
         
-        conn = sqlite3.connect("data/medical_scheduler.db")
+        # Date is part of the cache key so today's count rolls over at midnight
+        today = datetime.now().strftime('%Y-%m-%d')
+        total_patients, today_appointments, total_doctors = _quick_stats(today)
         
-        # Total patients
-        total_patients = pd.read_sql_query("SELECT COUNT(*) as count FROM patients", conn).iloc[0]['count']
         st.metric("Total Patients", total_patients)
-        
-        # Today's appointments
-        today = datetime.now().strftime('%Y-%m-%d')
-        today_appointments = pd.read_sql_query(
-            "SELECT COUNT(*) as count FROM appointments WHERE appointment_date = ?", 
-            conn, params=[today]
-        ).iloc[0]['count']
         st.metric("Today's Appointments", today_appointments)
-        
-        # Available doctors
-        total_doctors = pd.read_sql_query("SELECT COUNT(*) as count FROM doctors", conn).iloc[0]['count']
         st.metric("Available Doctors", total_doctors)
         
-        conn.close()
-        
         # Reset conversation
         if st.button("🔄 Reset Conversation"):
+            _quick_stats.clear()
             st.session_state.messages = []
+            st.session_state.messages_html = ""
             st.session_state.current_step = 'greeting'
             st.session_state.patient_data = {}
             st.session_state.appointment_data = {}
@@ -151,6 +274,12 @@ def main():
     elif page == "�🛠️ Admin Panel":
         show_admin_panel()
 
+def add_message(role, content):
+    """Append a chat message and its rendered HTML to the session"""
+    message = {"role": role, "content": content}
+    st.session_state.messages.append(message)
+    st.session_state.messages_html += render_messages_html([message])
+
 def show_chat_interface():
     st.header("💬 AI Scheduling Assistant")
     
@@ -158,24 +287,42 @@ def show_chat_interface():
     chat_container = st.container()
     
     with chat_container:
-        for message in st.session_state.messages:
-            if message['role'] == 'user':
-                st.markdown(f'<div class="user-message">{message["content"]}</div>', unsafe_allow_html=True)
+        # History HTML is built incrementally in add_message(), so render it in one go
+        if st.session_state.messages_html:
+            st.markdown(st.session_state.messages_html, unsafe_allow_html=True)
+    
+    # Report background communications that have finished since the last rerun
+    still_pending = []
+    for label, future in st.session_state.pending_comms:
+        if not future.done():
+            still_pending.append((label, future))
+            continue
+        if future.exception() is not None:
+            st.toast(f"❌ {label} failed: {future.exception()}")
+            continue
+        # Senders report (ok, message), or a dict of those keyed by channel
+        result = future.result()
+        outcomes = result.items() if isinstance(result, dict) else [(None, result)]
+        for channel, (ok, message) in outcomes:
+            name = f"{label} ({channel.upper()})" if channel else label
+            if ok:
+                st.toast(f"✉️ {name} sent")
             else:
-                st.markdown(f'<div class="bot-message">{message["content"]}</div>', unsafe_allow_html=True)
+                st.toast(f"❌ {name} failed: {message}")
+    st.session_state.pending_comms = still_pending
     
     # Chat input
     user_input = st.chat_input("Type your message here...")
     
     if user_input:
         # Add user message
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        add_message("user", user_input)
         
         # Process with agent
         response = process_user_message(user_input)
         
         # Add bot response
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        add_message("assistant", response)
         
         st.rerun()
     
@@ -186,19 +333,19 @@ def show_chat_interface():
     with col1:
         if st.button("📞 New Appointment"):
             quick_response = "Hello! I'd be happy to help you schedule a new appointment. May I have your full name please?"
-            st.session_state.messages.append({"role": "assistant", "content": quick_response})
+            add_message("assistant", quick_response)
             st.rerun()
     
     with col2:
         if st.button("🔍 Find Patient"):
             quick_response = "I can help you find an existing patient. Please provide the patient's name or phone number."
-            st.session_state.messages.append({"role": "assistant", "content": quick_response})
+            add_message("assistant", quick_response)
             st.rerun()
     
     with col3:
         if st.button("📋 View Doctors"):
             doctors_response = get_doctors_list()
-            st.session_state.messages.append({"role": "assistant", "content": doctors_response})
+            add_message("assistant", doctors_response)
             st.rerun()
 
 def process_user_message(user_input):
@@ -210,11 +357,11 @@ def process_user_message(user_input):
 def handle_name_input(user_input):
     """Handle name input from user"""
     # Extract name (simple parsing)
-    name_parts = user_input.replace('my name is', '').replace('i am', '').replace('this is', '').strip().split()
+    name_parts = _NAME_TOKEN_RE.findall(_NAME_PREFIX_RE.sub('', user_input))
     
     if len(name_parts) >= 2:
-        first_name = name_parts[0].strip(',.')
-        last_name = name_parts[1].strip(',.')
+        first_name = name_parts[0]
+        last_name = name_parts[1]
         
         st.session_state.patient_data['first_name'] = first_name
         st.session_state.patient_data['last_name'] = last_name
@@ -227,16 +374,17 @@ def handle_name_input(user_input):
 
 def search_patient_response():
     """Search for patient and return appropriate response"""
-    if 'first_name' in st.session_state.patient_data:
-        first_name = st.session_state.patient_data['first_name']
-        last_name = st.session_state.patient_data['last_name']
+    pdat = st.session_state.patient_data
+    if 'first_name' in pdat:
+        first_name = pdat['first_name']
+        last_name = pdat['last_name']
         
         # Search in database
         patients = st.session_state.agent.search_patient_by_name(first_name, last_name)
         
         if len(patients) > 0:
             patient = patients.iloc[0]
-            st.session_state.patient_data.update(patient.to_dict())
+            pdat.update(patient.to_dict())
             st.session_state.current_step = 'patient_found'
             
             patient_type = "returning" if not patient['is_new_patient'] else "new"
@@ -253,7 +401,7 @@ Patient Details:
 Would you like to see available appointment slots? Please let me know your preferred doctor or I can show you all available options."""
         else:
             st.session_state.current_step = 'new_patient'
-            st.session_state.patient_data['is_new_patient'] = True
+            pdat['is_new_patient'] = True
             
             return f"""I don't see an existing record for {first_name} {last_name}. This appears to be your first visit with us - welcome!
 
@@ -270,8 +418,9 @@ Could you please provide your phone number?"""
 def handle_phone_input(user_input):
     """Handle phone number input"""
     # Extract phone number
-    phone = ''.join(c for c in user_input if c.isdigit() or c in '()-. ')
-    st.session_state.patient_data['phone'] = phone
+    pdat = st.session_state.patient_data
+    phone = _PHONE_STRIP_RE.sub('', user_input)
+    pdat['phone'] = phone
     
     if st.session_state.current_step == 'new_patient':
         return "Thank you! Now could you please provide your email address?"
@@ -280,20 +429,28 @@ def handle_phone_input(user_input):
         patients = st.session_state.agent.search_patient_by_phone(phone)
         if len(patients) > 0:
             patient = patients.iloc[0]
-            st.session_state.patient_data.update(patient.to_dict())
+            pdat.update(patient.to_dict())
             st.session_state.current_step = 'patient_found'
             return f"Found your record! Welcome back, {patient['first_name']} {patient['last_name']}. Let's find you an appointment."
         else:
             return "I couldn't find a record with that phone number. Let's proceed as a new patient."
 
+@st.cache_data(ttl=300)
+def _doctor_options_df():
+    """Doctors table (cached; doctors change rarely)"""
+    doctors = pd.read_sql_query("SELECT * FROM doctors", get_conn())
+    # A handful of specialties repeated across rows; categorical keeps the cached copy small
+    return doctors.astype({'specialty': 'category'}, copy=False)
+
 def show_available_slots():
     """Show available appointment slots"""
     # Get available doctors
-    doctors = st.session_state.agent.get_available_doctors()
+    doctors = _doctor_options_df()
     
-    doctors_text = "Available doctors:\n"
-    for _, doctor in doctors.iterrows():
-        doctors_text += f"- {doctor['doctor_name']} (ID: {doctor['doctor_id']}) - {doctor['specialty']}\n"
+    doctors_text = "Available doctors:\n" + "".join(
+        f"- {name} (ID: {doctor_id}) - {specialty}\n"
+        for doctor_id, name, specialty in doctors[['doctor_id', 'doctor_name', 'specialty']].to_numpy()
+    )
     
     return f"""{doctors_text}
 
@@ -303,51 +460,59 @@ Would you like to:
 
 Please let me know your preference, or specify a doctor by name or ID."""
 
+@st.cache_data(ttl=300)
 def get_doctors_list():
     """Get formatted list of doctors"""
-    doctors = st.session_state.agent.get_available_doctors()
+    doctors = _doctor_options_df()
     
-    doctors_text = "Our available doctors:\n\n"
-    for _, doctor in doctors.iterrows():
-        doctors_text += f"🩺 **{doctor['doctor_name']}** (ID: {doctor['doctor_id']})\n"
-        doctors_text += f"   Specialty: {doctor['specialty']}\n\n"
+    doctors_text = "Our available doctors:\n\n" + "".join(
+        f"🩺 **{name}** (ID: {doctor_id})\n   Specialty: {specialty}\n\n"
+        for doctor_id, name, specialty in doctors[['doctor_id', 'doctor_name', 'specialty']].to_numpy()
+    )
     
     return doctors_text
 
 def handle_appointment_confirmation(user_input):
     """Handle appointment confirmation"""
-    if 'selected_slot' in st.session_state.appointment_data:
+    pdat = st.session_state.patient_data
+    adat = st.session_state.appointment_data
+    agent = st.session_state.agent
+    comm = st.session_state.comm_manager
+    
+    if 'selected_slot' in adat:
         # Book the appointment
-        slot = st.session_state.appointment_data['selected_slot']
+        slot = adat['selected_slot']
+        is_new_patient = pdat.get('is_new_patient', True)
         
         try:
-            appointment_id, duration = st.session_state.agent.book_appointment_slot(
-                st.session_state.patient_data['patient_id'],
+            appointment_id, duration = agent.book_appointment_slot(
+                pdat['patient_id'],
                 slot['doctor_id'],
                 slot['date'],
                 slot['time'],
-                st.session_state.patient_data.get('is_new_patient', True)
+                is_new_patient
             )
             
+            # New booking changes the sidebar counts
+            _quick_stats.clear()
+            
             # Send confirmation
             appointment_info = {
                 'date': slot['date'],
                 'time': slot['time'],
                 'doctor_name': slot['doctor_name'],
                 'duration': duration,
-                'appointment_type': 'New Patient' if st.session_state.patient_data.get('is_new_patient', True) else 'Follow-up'
+                'appointment_type': 'New Patient' if is_new_patient else 'Follow-up'
             }
+            full_name = f"{pdat['first_name']} {pdat['last_name']}"
             
-            # Send communications
-            comm_result = st.session_state.comm_manager.send_appointment_confirmation(
-                st.session_state.patient_data,
-                appointment_info
-            )
-            
-            forms_result = st.session_state.comm_manager.send_intake_forms(
-                st.session_state.patient_data['email'],
-                f"{st.session_state.patient_data['first_name']} {st.session_state.patient_data['last_name']}"
-            )
+            # Send communications in the background; delivery status is shown on a later rerun
+            executor = get_comm_executor()
+            patient_info = dict(pdat)
+            st.session_state.pending_comms.extend([
+                ("Appointment confirmation", executor.submit(comm.send_appointment_confirmation, patient_info, appointment_info)),
+                ("Intake forms", executor.submit(comm.send_intake_forms, patient_info['email'], full_name)),
+            ])
             
             return f"""✅ **Appointment Confirmed!**
 
@@ -357,9 +522,9 @@ Time: {slot['time']}
 Doctor: {slot['doctor_name']}
 Duration: {duration} minutes
 
-📧 Confirmation email sent to: {st.session_state.patient_data['email']}
-📱 SMS confirmation sent to: {st.session_state.patient_data['phone']}
-📋 Intake forms have been emailed to you
+📧 Confirmation email is being sent to: {pdat['email']}
+📱 SMS confirmation is being sent to: {pdat['phone']}
+📋 Intake forms are being emailed to you
 
 **Important reminders:**
 - Please arrive 15 minutes early
@@ -376,51 +541,73 @@ Thank you for choosing MediCare Allergy & Wellness Center!"""
 
 def handle_doctor_preference(user_input):
     """Handle doctor preference"""
-    doctors = st.session_state.agent.get_available_doctors()
+    doctors = _doctor_options_df()
     
-    # Simple matching by name
-    for _, doctor in doctors.iterrows():
-        if doctor['doctor_name'].lower() in user_input.lower() or doctor['doctor_id'].lower() in user_input.lower():
-            # Get slots for this doctor
-            slots = st.session_state.agent.get_available_slots(doctor['doctor_id'])
-            
-            if len(slots) > 0:
-                slots_text = f"Available slots for {doctor['doctor_name']}:\n\n"
-                for i, (_, slot) in enumerate(slots.head(10).iterrows()):
-                    slots_text += f"{i+1}. {slot['date']} at {slot['time']}\n"
-                
-                slots_text += "\nPlease tell me which slot you'd prefer (e.g., 'I'd like slot 1' or 'Book slot 3')."
-                return slots_text
-            else:
-                return f"I'm sorry, but {doctor['doctor_name']} doesn't have any available slots in the next few days. Would you like to see other doctors' availability?"
+    # Simple matching by name or ID, with the input lowercased once
+    ui = user_input.lower()
+    
+    def mentioned(values):
+        return values.map(lambda v: isinstance(v, str) and v.lower() in ui)
+    
+    matches = doctors[mentioned(doctors['doctor_name']) | mentioned(doctors['doctor_id'])]
+    if matches.empty:
+        return "I couldn't find that doctor. Please check the doctor's name or ID from the list above."
     
-    return "I couldn't find that doctor. Please check the doctor's name or ID from the list above."
+    doctor = matches.iloc[0]
+    
+    # Get slots for this doctor
+    slots = st.session_state.agent.get_available_slots(doctor['doctor_id'])
+    
+    if len(slots) > 0:
+        top_slots = slots.head(10)[['date', 'time']].to_numpy()
+        slot_lines = "\n".join(f"{i}. {date} at {time}" for i, (date, time) in enumerate(top_slots, 1))
+        return (
+            f"Available slots for {doctor['doctor_name']}:\n\n{slot_lines}\n\n"
+            "Please tell me which slot you'd prefer (e.g., 'I'd like slot 1' or 'Book slot 3')."
+        )
+    else:
+        return f"I'm sorry, but {doctor['doctor_name']} doesn't have any available slots in the next few days. Would you like to see other doctors' availability?"
+
+@st.cache_data(ttl=60)
+def _patient_types_fig(rows):
+    """Patient type pie chart, rebuilt only when the counts change"""
+    import plotly.express as px  # deferred: only the Analytics page needs Plotly
+    df = pd.DataFrame(rows, columns=['patient_type', 'count'])
+    return px.pie(df, values='count', names='patient_type', title="Patient Distribution")
+
+@st.cache_data(ttl=60)
+def _doctor_appointments_fig(rows):
+    """Appointments-per-doctor bar chart, rebuilt only when the counts change"""
+    import plotly.express as px
+    df = pd.DataFrame(rows, columns=['doctor_name', 'appointments'])
+    return px.bar(df, x='doctor_name', y='appointments', title="Appointments by Doctor")
 
 def show_analytics():
     st.header("📊 Analytics Dashboard")
     
-    conn = sqlite3.connect("data/medical_scheduler.db")
+    conn = get_conn()
+    
+    # Metrics row (all four counts in a single round trip)
+    total_patients, new_patients, total_appointments, today_appointments = conn.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM patients) AS total_patients,
+            (SELECT COUNT(*) FROM patients WHERE is_new_patient = 1) AS new_patients,
+            (SELECT COUNT(*) FROM appointments) AS total_appointments,
+            (SELECT COUNT(*) FROM appointments WHERE appointment_date = ?) AS today_appointments
+    """, (datetime.now().strftime('%Y-%m-%d'),)).fetchone()
     
-    # Metrics row
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_patients = pd.read_sql_query("SELECT COUNT(*) as count FROM patients", conn).iloc[0]['count']
         st.metric("Total Patients", total_patients)
     
     with col2:
-        total_appointments = pd.read_sql_query("SELECT COUNT(*) as count FROM appointments", conn).iloc[0]['count']
         st.metric("Total Appointments", total_appointments)
     
     with col3:
-        new_patients = pd.read_sql_query("SELECT COUNT(*) as count FROM patients WHERE is_new_patient = 1", conn).iloc[0]['count']
         st.metric("New Patients", new_patients)
     
     with col4:
-        today_appointments = pd.read_sql_query(
-            "SELECT COUNT(*) as count FROM appointments WHERE appointment_date = ?", 
-            conn, params=[datetime.now().strftime('%Y-%m-%d')]
-        ).iloc[0]['count']
         st.metric("Today's Appointments", today_appointments)
     
     # Charts
@@ -428,39 +615,33 @@ def show_analytics():
     
     with col1:
         st.subheader("Patient Types")
-        patient_types = pd.read_sql_query("""
+        patient_types = conn.execute("""
             SELECT 
                 CASE WHEN is_new_patient = 1 THEN 'New' ELSE 'Returning' END as patient_type,
                 COUNT(*) as count
             FROM patients 
             GROUP BY is_new_patient
-        """, conn)
+        """).fetchall()
         
         if len(patient_types) > 0:
-            fig = px.pie(patient_types, values='count', names='patient_type', 
-                        title="Patient Distribution")
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(_patient_types_fig(tuple(patient_types)), use_container_width=True)
     
     with col2:
         st.subheader("Appointments by Doctor")
-        doctor_appointments = pd.read_sql_query("""
+        doctor_appointments = conn.execute("""
             SELECT d.doctor_name, COUNT(a.appointment_id) as appointments
             FROM doctors d
             LEFT JOIN appointments a ON d.doctor_id = a.doctor_id
             GROUP BY d.doctor_id, d.doctor_name
-        """, conn)
+        """).fetchall()
         
         if len(doctor_appointments) > 0:
-            fig = px.bar(doctor_appointments, x='doctor_name', y='appointments',
-                        title="Appointments by Doctor")
-            st.plotly_chart(fig, use_container_width=True)
-    
-    conn.close()
+            st.plotly_chart(_doctor_appointments_fig(tuple(doctor_appointments)), use_container_width=True)
 
 def show_appointments():
     st.header("📅 Appointment Management")
     
-    conn = sqlite3.connect("data/medical_scheduler.db")
+    conn = get_conn()
     
     # Date filter
     col1, col2 = st.columns(2)
@@ -469,55 +650,107 @@ def show_appointments():
     with col2:
         end_date = st.date_input("End Date", datetime.now() + timedelta(days=7))
     
-    # Get appointments
+    page = st.number_input("Page", min_value=1, value=1, step=1)
+    
+    # Get one page of appointments, projecting only the displayed columns
     appointments = pd.read_sql_query("""
-        SELECT a.*, p.first_name, p.last_name, p.phone, p.email, d.doctor_name
+        SELECT a.appointment_id, a.appointment_date, a.appointment_time, a.duration,
+               a.appointment_type, a.status,
+               p.first_name, p.last_name, p.phone, p.email, d.doctor_name
         FROM appointments a
         JOIN patients p ON a.patient_id = p.patient_id
         JOIN doctors d ON a.doctor_id = d.doctor_id
         WHERE a.appointment_date BETWEEN ? AND ?
         ORDER BY a.appointment_date, a.appointment_time
-    """, conn, params=[start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')])
+        LIMIT ? OFFSET ?
+    """, conn, params=[start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'),
+                       APPOINTMENTS_PAGE_SIZE, (page - 1) * APPOINTMENTS_PAGE_SIZE])
+    appointments = appointments.astype(
+        {'status': 'category', 'appointment_type': 'category', 'doctor_name': 'category'}, copy=False
+    )
     
     if len(appointments) > 0:
-        st.subheader(f"Appointments ({len(appointments)} found)")
+        st.subheader(f"Appointments ({len(appointments)} found on page {page})")
         
-        for _, apt in appointments.iterrows():
-            with st.expander(f"{apt['first_name']} {apt['last_name']} - {apt['appointment_date']} {apt['appointment_time']}"):
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.write(f"**Patient:** {apt['first_name']} {apt['last_name']}")
-                    st.write(f"**Phone:** {apt['phone']}")
-                    st.write(f"**Email:** {apt['email']}")
-                    st.write(f"**Date:** {apt['appointment_date']}")
-                    st.write(f"**Time:** {apt['appointment_time']}")
-                
-                with col2:
-                    st.write(f"**Doctor:** {apt['doctor_name']}")
-                    st.write(f"**Duration:** {apt['duration']} minutes")
-                    st.write(f"**Type:** {apt['appointment_type']}")
-                    st.write(f"**Status:** {apt['status']}")
-                
-                # Action buttons
-                button_col1, button_col2, button_col3 = st.columns(3)
-                with button_col1:
-                    if st.button(f"Send Reminder", key=f"reminder_{apt['appointment_id']}"):
-                        # Send reminder logic here
-                        st.success("Reminder sent!")
-                
-                with button_col2:
-                    if st.button(f"Cancel", key=f"cancel_{apt['appointment_id']}"):
-                        # Cancel appointment logic here
-                        st.warning("Appointment cancelled!")
-                
-                with button_col3:
-                    if st.button(f"Reschedule", key=f"reschedule_{apt['appointment_id']}"):
-                        st.info("Reschedule functionality coming soon!")
+        # One table render for the list; widgets are only built for the opened appointment
+        st.dataframe(
+            appointments[['first_name', 'last_name', 'appointment_date', 'appointment_time', 'doctor_name', 'status']],
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        cols = ['appointment_id', 'first_name', 'last_name', 'appointment_date', 'appointment_time',
+                'phone', 'email', 'doctor_name', 'duration', 'appointment_type', 'status']
+        rows = {row[0]: row for row in appointments[cols].itertuples(index=False, name=None)}
+        labels = {
+            appointment_id: f"{row[1]} {row[2]} - {row[3]} {row[4]}"
+            for appointment_id, row in rows.items()
+        }
+        selected_id = st.selectbox("Open appointment", options=list(rows), format_func=labels.get)
+        (_, first_name, last_name, appointment_date, appointment_time,
+         phone, email, doctor_name, duration, appointment_type, status) = rows[selected_id]
+        
+        with st.expander(labels[selected_id], expanded=True):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.write(f"**Patient:** {first_name} {last_name}")
+                st.write(f"**Phone:** {phone}")
+                st.write(f"**Email:** {email}")
+                st.write(f"**Date:** {appointment_date}")
+                st.write(f"**Time:** {appointment_time}")
+            
+            with col2:
+                st.write(f"**Doctor:** {doctor_name}")
+                st.write(f"**Duration:** {duration} minutes")
+                st.write(f"**Type:** {appointment_type}")
+                st.write(f"**Status:** {status}")
+            
+            # Action buttons
+            button_col1, button_col2, button_col3 = st.columns(3)
+            with button_col1:
+                if st.button(f"Send Reminder", key=f"reminder_{selected_id}"):
+                    # Send reminder logic here
+                    st.success("Reminder sent!")
+            
+            with button_col2:
+                if st.button(f"Cancel", key=f"cancel_{selected_id}"):
+                    # Cancel appointment logic here
+                    st.warning("Appointment cancelled!")
+            
+            with button_col3:
+                if st.button(f"Reschedule", key=f"reschedule_{selected_id}"):
+                    st.info("Reschedule functionality coming soon!")
     else:
         st.info("No appointments found for the selected date range.")
+
+@contextmanager
+def export_query_to_csv(conn, query, prefix):
+    """
+    Stream query results into a CSV for download; yields (file_name, file, row_count)
     
-    conn.close()
+    Rows go through a spooled temporary file (in memory, spilling to a temp file
+    for large exports) that is deleted when the block exits, so patient data never
+    lands in the project tree. The file is binary, ready for st.download_button,
+    which only accepts file objects it recognises - hence the BufferedReader.
+    """
+    file_name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    
+    cursor = conn.execute(query)
+    row_count = 0
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+        text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow([col[0] for col in cursor.description])
+        for batch in iter(lambda: cursor.fetchmany(5000), []):
+            writer.writerows(batch)
+            row_count += len(batch)
+        # Flush and let go of the spool without closing it
+        text.detach()
+        
+        reader = io.BufferedReader(f)
+        reader.seek(0)
+        yield file_name, reader, row_count
 
 def show_admin_panel():
     st.header("🛠️ Admin Panel")
@@ -527,19 +760,24 @@ def show_admin_panel():
     with tab1:
         st.subheader("Database Status")
         
-        conn = sqlite3.connect("data/medical_scheduler.db")
+        conn = get_conn()
         
         # Table sizes
         tables = ['patients', 'doctors', 'appointments', 'doctor_schedules', 'reminders', 'patient_forms']
         
-        for table in tables:
-            try:
-                count = pd.read_sql_query(f"SELECT COUNT(*) as count FROM {table}", conn).iloc[0]['count']
+        # All counts in one round trip; table names come from the hardcoded list above
+        counts_sql = " UNION ALL ".join(f"SELECT '{table}', COUNT(*) FROM {table}" for table in tables)
+        try:
+            for table, count in conn.execute(counts_sql).fetchall():
                 st.metric(f"{table.title()} Records", count)
-            except:
-                st.error(f"Error reading {table} table")
-        
-        conn.close()
+        except sqlite3.Error:
+            # Fall back to per-table counts so a missing table is reported on its own
+            for table in tables:
+                try:
+                    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    st.metric(f"{table.title()} Records", count)
+                except:
+                    st.error(f"Error reading {table} table")
     
     with tab2:
         st.subheader("📊 Export Data")
@@ -633,8 +871,7 @@ def show_admin_panel():
             if st.button("📬 Send Test Email Reminder"):
                 if test_email:
                     try:
-                        from automated_reminder_system import AutomatedReminderSystem
-                        reminder_system = AutomatedReminderSystem()
+                        reminder_system = get_reminder_system()
                         
                         # Create a test appointment data
                         test_appointment = {
@@ -665,8 +902,7 @@ def show_admin_panel():
             if st.button("📱 Send Test SMS Reminder"):
                 if test_phone:
                     try:
-                        from automated_reminder_system import AutomatedReminderSystem
-                        reminder_system = AutomatedReminderSystem()
+                        reminder_system = get_reminder_system()
                         
                         # Create a test appointment data
                         test_appointment = {
@@ -697,25 +933,22 @@ def show_admin_panel():
         with col1:
             if st.button("📋 Export Patients CSV"):
                 try:
-                    conn_csv = sqlite3.connect("data/medical_scheduler.db")
-                    patients_df = pd.read_sql_query("SELECT * FROM patients", conn_csv)
-                    conn_csv.close()
-                    
-                    csv = patients_df.to_csv(index=False)
-                    st.download_button(
-                        label="⬇️ Download Patients CSV",
-                        data=csv,
-                        file_name=f"patients_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
-                    st.success(f"✅ Patients CSV ready for download ({len(patients_df)} records)")
+                    conn_csv = get_conn()
+                    with export_query_to_csv(conn_csv, "SELECT * FROM patients", "patients_export") as (csv_name, csv_file, record_count):
+                        st.download_button(
+                            label="⬇️ Download Patients CSV",
+                            data=csv_file,
+                            file_name=csv_name,
+                            mime="text/csv"
+                        )
+                    st.success(f"✅ Patients CSV ready for download ({record_count} records)")
                 except Exception as e:
                     st.error(f"❌ Error exporting patients: {e}")
         
         with col2:
             if st.button("📅 Export Appointments CSV"):
                 try:
-                    conn_csv = sqlite3.connect("data/medical_scheduler.db")
+                    conn_csv = get_conn()
                     appointments_query = """
                         SELECT 
                             a.*,
@@ -726,24 +959,21 @@ def show_admin_panel():
                         JOIN doctors d ON a.doctor_id = d.doctor_id
                         ORDER BY a.appointment_date DESC, a.appointment_time DESC
                     """
-                    appointments_df = pd.read_sql_query(appointments_query, conn_csv)
-                    conn_csv.close()
-                    
-                    csv = appointments_df.to_csv(index=False)
-                    st.download_button(
-                        label="⬇️ Download Appointments CSV",
-                        data=csv,
-                        file_name=f"appointments_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
-                    st.success(f"✅ Appointments CSV ready for download ({len(appointments_df)} records)")
+                    with export_query_to_csv(conn_csv, appointments_query, "appointments_export") as (csv_name, csv_file, record_count):
+                        st.download_button(
+                            label="⬇️ Download Appointments CSV",
+                            data=csv_file,
+                            file_name=csv_name,
+                            mime="text/csv"
+                        )
+                    st.success(f"✅ Appointments CSV ready for download ({record_count} records)")
                 except Exception as e:
                     st.error(f"❌ Error exporting appointments: {e}")
         
         with col3:
             if st.button("📨 Export Reminders CSV"):
                 try:
-                    conn_csv = sqlite3.connect("data/medical_scheduler.db")
+                    conn_csv = get_conn()
                     reminders_query = """
                         SELECT 
                             r.*,
@@ -754,49 +984,29 @@ def show_admin_panel():
                         JOIN appointments a ON r.appointment_id = a.appointment_id
                         ORDER BY r.scheduled_time DESC
                     """
-                    reminders_df = pd.read_sql_query(reminders_query, conn_csv)
-                    conn_csv.close()
-                    
-                    csv = reminders_df.to_csv(index=False)
-                    st.download_button(
-                        label="⬇️ Download Reminders CSV",
-                        data=csv,
-                        file_name=f"reminders_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
-                    st.success(f"✅ Reminders CSV ready for download ({len(reminders_df)} records)")
+                    with export_query_to_csv(conn_csv, reminders_query, "reminders_export") as (csv_name, csv_file, record_count):
+                        st.download_button(
+                            label="⬇️ Download Reminders CSV",
+                            data=csv_file,
+                            file_name=csv_name,
+                            mime="text/csv"
+                        )
+                    st.success(f"✅ Reminders CSV ready for download ({record_count} records)")
                 except Exception as e:
                     st.error(f"❌ Error exporting reminders: {e}")
         
         # Reminder System Status
         st.subheader("📊 Reminder System Status")
         
+        # Assume there may be confirmed appointments unless the status query says otherwise
+        has_confirmed = True
+        
         try:
-            conn_status = sqlite3.connect("data/medical_scheduler.db")
-            
-            # Get pending reminders count
-            pending_reminders = pd.read_sql_query("""
-                SELECT COUNT(*) as count 
-                FROM reminders 
-                WHERE status = 'pending' AND scheduled_time <= datetime('now')
-            """, conn_status).iloc[0]['count']
+            conn_status = get_conn()
             
-            # Get sent reminders count today
-            sent_today = pd.read_sql_query("""
-                SELECT COUNT(*) as count 
-                FROM reminders 
-                WHERE status = 'sent' AND DATE(sent_time) = DATE('now')
-            """, conn_status).iloc[0]['count']
-            
-            # Get upcoming appointments (next 7 days)
-            upcoming_appointments = pd.read_sql_query("""
-                SELECT COUNT(*) as count 
-                FROM appointments 
-                WHERE appointment_date BETWEEN DATE('now') AND DATE('now', '+7 days')
-                AND status = 'confirmed'
-            """, conn_status).iloc[0]['count']
-            
-            conn_status.close()
+            pending_reminders, sent_today, upcoming_appointments, has_confirmed = conn_status.execute(
+                _SQL_REMINDER_STATUS
+            ).fetchone()
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -813,52 +1023,57 @@ def show_admin_panel():
         st.subheader("🔧 Manual Reminder Test")
         
         try:
-            conn_test = sqlite3.connect("data/medical_scheduler.db")
+            conn_test = get_conn()
             latest_appt_query = """
                 SELECT a.appointment_id, a.appointment_date, a.appointment_time,
                        p.first_name, p.last_name, p.email, p.phone, d.doctor_name
-                FROM appointments a
+                FROM (
+                    -- Pick the latest 5 first so the joins only touch 5 rows
+                    SELECT appointment_id, appointment_date, appointment_time, patient_id, doctor_id
+                    FROM appointments
+                    WHERE status = 'confirmed'
+                    ORDER BY appointment_id DESC
+                    LIMIT 5
+                ) a
                 JOIN patients p ON a.patient_id = p.patient_id  
                 JOIN doctors d ON a.doctor_id = d.doctor_id
-                WHERE a.status = 'confirmed'
                 ORDER BY a.appointment_id DESC
-                LIMIT 5
             """
-            latest_appointments = pd.read_sql_query(latest_appt_query, conn_test)
-            conn_test.close()
+            # Skip the three-way join when the status query found no confirmed appointments
+            latest_appointments = conn_test.execute(latest_appt_query).fetchall() if has_confirmed else []
             
-            if not latest_appointments.empty:
+            if latest_appointments:
                 st.write("**Select an appointment to test reminder:**")
                 
-                for idx, appt in latest_appointments.iterrows():
+                for (appointment_id, appointment_date, appointment_time,
+                     first_name, last_name, email, phone, doctor_name) in latest_appointments:
+                    appointment_data = {
+                        'patient_name': f"{first_name} {last_name}",
+                        'doctor_name': doctor_name,
+                        'appointment_date': appointment_date,
+                        'appointment_time': appointment_time,
+                        'email': email,
+                        'phone': phone,
+                        'appointment_id': appointment_id,
+                        'specialty': 'General Medicine'
+                    }
+                    
                     col1, col2 = st.columns([3, 1])
                     
                     with col1:
-                        st.write(f"**{appt['first_name']} {appt['last_name']}** - Dr. {appt['doctor_name']}")
-                        st.write(f"📅 {appt['appointment_date']} at {appt['appointment_time']}")
-                        st.write(f"📧 {appt['email']} | 📱 {appt['phone']}")
+                        st.markdown(
+                            f"**{appointment_data['patient_name']}** - Dr. {doctor_name}  \n"
+                            f"📅 {appointment_date} at {appointment_time}  \n"
+                            f"📧 {email} | 📱 {phone}"
+                        )
                     
                     with col2:
-                        if st.button(f"📬 Test", key=f"test_{appt['appointment_id']}"):
+                        if st.button(f"📬 Test", key=f"test_{appointment_id}"):
                             try:
-                                from automated_reminder_system import AutomatedReminderSystem
-                                reminder_system = AutomatedReminderSystem()
-                                
-                                appointment_data = {
-                                    'patient_name': f"{appt['first_name']} {appt['last_name']}",
-                                    'doctor_name': appt['doctor_name'],
-                                    'appointment_date': appt['appointment_date'],
-                                    'appointment_time': appt['appointment_time'],
-                                    'email': appt['email'],
-                                    'phone': appt['phone'],
-                                    'appointment_id': appt['appointment_id'],
-                                    'specialty': 'General Medicine'
-                                }
-                                
-                                success = reminder_system.send_initial_reminder(appointment_data)
+                                success = get_reminder_system().send_initial_reminder(appointment_data)
                                 
                                 if success:
-                                    st.success(f"✅ Test reminder sent to {appt['email']}")
+                                    st.success(f"✅ Test reminder sent to {email}")
                                 else:
                                     st.error("❌ Failed to send reminder")
                             except Exception as e:
@@ -879,8 +1094,7 @@ def show_admin_panel():
         
         if st.button("🧪 Test Email Settings"):
             try:
-                from automated_reminder_system import AutomatedReminderSystem
-                reminder_system = AutomatedReminderSystem()
+                reminder_system = get_reminder_system()
                 
                 if reminder_system.test_email_config():
                     st.success("✅ Email configuration is working correctly!")
@@ -897,22 +1111,21 @@ def show_admin_panel():
         
         if st.button("🔍 Check Database Schema"):
             try:
-                conn_schema = sqlite3.connect("data/medical_scheduler.db")
+                conn_schema = get_conn()
                 
                 # Get table info
                 tables_query = "SELECT name FROM sqlite_master WHERE type='table'"
-                tables_df = pd.read_sql_query(tables_query, conn_schema)
+                tables = [row[0] for row in conn_schema.execute(tables_query)]
                 
                 st.write("**Available Tables:**")
-                for table in tables_df['name']:
+                for table in tables:
                     st.write(f"📋 {table}")
                 
                 # Check reminders table structure
                 st.write("**Reminders Table Structure:**")
-                reminders_schema = pd.read_sql_query("PRAGMA table_info(reminders)", conn_schema)
-                st.dataframe(reminders_schema)
-                
-                conn_schema.close()
+                schema_cursor = conn_schema.execute("PRAGMA table_info(reminders)")
+                schema_columns = [col[0] for col in schema_cursor.description]
+                st.dataframe([dict(zip(schema_columns, row)) for row in schema_cursor])
                 
             except Exception as e:
                 st.error(f"❌ Database error: {e}")
@@ -920,15 +1133,19 @@ def show_admin_panel():
         # Initialize Database
         if st.button("🔧 Initialize/Update Database"):
             try:
-                from database_manager import DatabaseManager
                 db_manager = DatabaseManager()
+                # Doctor lists and counts may have changed
+                _quick_stats.clear()
+                _doctor_options_df.clear()
+                get_doctors_list.clear()
+                _calendar_doctors_df.clear()
                 st.success("✅ Database initialized successfully!")
                 
             except Exception as e:
                 st.error(f"❌ Database initialization error: {e}")
         
         # Get appointments for testing
-        conn_test2 = sqlite3.connect("data/medical_scheduler.db")
+        conn_test2 = get_conn()
         appointments_test = pd.read_sql_query("""
             SELECT 
                 a.appointment_id,
@@ -936,21 +1153,29 @@ def show_admin_panel():
                 a.appointment_date,
                 a.appointment_time,
                 d.doctor_name
-            FROM appointments a
+            FROM (
+                SELECT appointment_id, appointment_date, appointment_time, patient_id, doctor_id
+                FROM appointments
+                ORDER BY appointment_date DESC
+                LIMIT 10
+            ) a
             JOIN patients p ON a.patient_id = p.patient_id
             JOIN doctors d ON a.doctor_id = d.doctor_id
             ORDER BY a.appointment_date DESC
-            LIMIT 10
-        """, conn_test2)
-        conn_test2.close()
+        """, conn_test2).astype({'doctor_name': 'category'}, copy=False)
         
         if len(appointments_test) > 0:
             st.subheader("🧪 Advanced Reminder Testing")
             
+            # appointment_id -> (patient_name, appointment_date) for O(1) option labels
+            appointment_lookup = dict(zip(
+                appointments_test['appointment_id'],
+                zip(appointments_test['patient_name'], appointments_test['appointment_date'])
+            ))
             selected_appointment = st.selectbox(
                 "Select Appointment for Testing",
-                appointments_test['appointment_id'].tolist(),
-                format_func=lambda x: f"ID: {x} - {appointments_test[appointments_test['appointment_id']==x]['patient_name'].iloc[0]} - {appointments_test[appointments_test['appointment_id']==x]['appointment_date'].iloc[0]}"
+                list(appointment_lookup),
+                format_func=lambda x: f"ID: {x} - {appointment_lookup[x][0]} - {appointment_lookup[x][1]}"
             )
             
             reminder_type = st.selectbox(
@@ -960,8 +1185,7 @@ def show_admin_panel():
             
             if st.button("🚀 Send Test Reminder"):
                 try:
-                    from automated_reminder_system import AutomatedReminderSystem
-                    reminder_system = AutomatedReminderSystem()
+                    reminder_system = get_reminder_system()
                     
                     # Create test reminder data
                     selected_appt = appointments_test[appointments_test['appointment_id']==selected_appointment].iloc[0]
@@ -997,14 +1221,25 @@ def show_admin_panel():
         else:
             st.info("No appointments available for testing")
 
+@st.cache_resource
+def get_calendar_system():
+    """Process-wide CalendarIntegration (configuration only, no per-user state)"""
+    from calendar_integration import CalendarIntegration
+    return CalendarIntegration()
+
+@st.cache_data(ttl=300)
+def _calendar_doctors_df():
+    """Doctors for the availability picker (cached; doctors change rarely)"""
+    doctors = pd.read_sql_query("SELECT doctor_id, doctor_name, specialty FROM doctors ORDER BY doctor_name", get_conn())
+    return doctors.astype({'specialty': 'category'}, copy=False)
+
 def show_calendar_integration():
     """Calendar Integration with Calendly-style functionality"""
     st.header("🗓️ Calendar Integration System")
     
     # Import calendar integration
     try:
-        from calendar_integration import CalendarIntegration
-        calendar_system = CalendarIntegration()
+        calendar_system = get_calendar_system()
         
         st.success("✅ Calendar integration system loaded successfully!")
         
@@ -1021,9 +1256,7 @@ def show_calendar_integration():
             
             try:
                 # Get list of doctors with error handling
-                conn = sqlite3.connect("data/medical_scheduler.db")
-                doctors_df = pd.read_sql_query("SELECT doctor_id, doctor_name, specialty FROM doctors ORDER BY doctor_name", conn)
-                conn.close()
+                doctors_df = _calendar_doctors_df()
                 
                 st.info(f"📊 Debug: Found {len(doctors_df)} doctors in database")
                 
@@ -1040,11 +1273,11 @@ def show_calendar_integration():
                     with col1:
                         # Show doctor selection with better formatting and error handling
                         doctor_options = []
-                        for _, row in doctors_df.iterrows():
+                        for row in doctors_df.itertuples(index=False):
                             # Ensure we have valid data
-                            doctor_id = row['doctor_id']
-                            doctor_name = row['doctor_name'] if pd.notna(row['doctor_name']) else 'Unknown'
-                            specialty = row['specialty'] if pd.notna(row['specialty']) else 'General'
+                            doctor_id = row.doctor_id
+                            doctor_name = row.doctor_name if pd.notna(row.doctor_name) else 'Unknown'
+                            specialty = row.specialty if pd.notna(row.specialty) else 'General'
                             
                             doctor_options.append({
                                 'id': str(doctor_id),
@@ -1076,7 +1309,8 @@ def show_calendar_integration():
                     if st.button("🔍 Get Available Slots", type="primary"):
                         with st.spinner("Loading available slots..."):
                             try:
-                                # Use the string ID directly (calendar system should handle conversion)
+                                # Use the string ID directly (calendar system should handle conversion);
+                                # slots are cached inside CalendarIntegration and dropped on booking
                                 availability = calendar_system.get_doctor_availability(selected_doctor_id, days_ahead)
                                 
                                 if 'error' not in availability:
@@ -1094,12 +1328,23 @@ def show_calendar_integration():
                                     if availability['slots_by_date']:
                                         for date, slots in list(availability['slots_by_date'].items())[:7]:  # Show first 7 days
                                             with st.expander(f"📅 {datetime.strptime(date, '%Y-%m-%d').strftime('%A, %B %d, %Y')} ({len(slots)} slots)"):
-                                                cols = st.columns(4)
-                                                for i, slot in enumerate(slots):
-                                                    with cols[i % 4]:
-                                                        if st.button(f"⏰ {slot['formatted_time']}", key=f"slot_{slot['slot_id']}"):
-                                                            st.success(f"Selected: {slot['formatted_time']} on {slot['formatted_date']}")
-                                                            st.info("💡 In a real booking system, this would open the booking form!")
+                                                # Static slot grid plus one picker, instead of one button widget per slot
+                                                slot_grid = "".join(
+                                                    f'<span style="{SLOT_CHIP_STYLE}">⏰ {slot["formatted_time"]}</span>'
+                                                    for slot in slots
+                                                )
+                                                st.markdown(f'<div style="{SLOT_GRID_STYLE}">{slot_grid}</div>', unsafe_allow_html=True)
+                                                
+                                                picked = st.selectbox(
+                                                    "Pick a slot:",
+                                                    slots,
+                                                    index=None,
+                                                    format_func=lambda slot: f"⏰ {slot['formatted_time']}",
+                                                    key=f"pick_{date}"
+                                                )
+                                                if picked:
+                                                    st.success(f"Selected: {picked['formatted_time']} on {picked['formatted_date']}")
+                                                    st.info("💡 In a real booking system, this would open the booking form!")
                                     else:
                                         st.warning("📅 No available slots found for the selected period")
                                         
@@ -1137,28 +1382,20 @@ def show_calendar_integration():
                     if calendar_data['success']:
                         st.success(f"✅ Loaded {calendar_data['total_appointments']} appointments")
                         
-                        # Display appointments
-                        for event in calendar_data['events']:
-                            start_time = datetime.fromisoformat(event['start'])
-                            
-                            # Color code by status
-                            if event['status'] == 'confirmed':
-                                color = '#d4edda'
-                            elif event['status'] == 'pending':
-                                color = '#fff3cd'
-                            else:
-                                color = '#f8d7da'
-                            
-                            st.markdown(f"""
-                            <div style="background-color: {color}; padding: 10px; border-radius: 5px; margin: 5px 0;">
-                                <strong>📅 {start_time.strftime('%Y-%m-%d %H:%M')}</strong><br>
-                                <strong>{event['title']}</strong><br>
-                                📧 {event['patient_email']}<br>
-                                📞 {event['patient_phone']}<br>
-                                🏥 {event['doctor_specialty']}<br>
-                                ✅ Status: {event['status'].title()}
-                            </div>
-                            """, unsafe_allow_html=True)
+                        # Display appointments, color coded by status, as a single markdown block.
+                        # event['start'] is ISO 8601, so its first 16 chars are "YYYY-MM-DDTHH:MM"
+                        events_html = "".join(
+                            f'''<div style="background-color: {EVENT_STATUS_COLORS.get(event['status'], '#f8d7da')}; padding: 10px; border-radius: 5px; margin: 5px 0;">
+<strong>📅 {event['start'][:16].replace('T', ' ')}</strong><br>
+<strong>{event['title']}</strong><br>
+📧 {event['patient_email']}<br>
+📞 {event['patient_phone']}<br>
+🏥 {event['doctor_specialty']}<br>
+✅ Status: {event['status'].title()}
+</div>'''
+                            for event in calendar_data['events']
+                        )
+                        st.markdown(events_html, unsafe_allow_html=True)
                     else:
                         st.error(f"❌ {calendar_data['error']}")
         
@@ -1173,25 +1410,23 @@ def show_calendar_integration():
             
             if st.button("📥 Export to Excel", type="primary"):
                 with st.spinner("Generating Excel export..."):
-                    excel_file = calendar_system.export_full_calendar_excel(
+                    export = calendar_system.export_full_calendar_excel(
                         export_start.strftime('%Y-%m-%d'),
                         export_end.strftime('%Y-%m-%d')
                     )
                     
-                    if excel_file:
+                    if export:
+                        excel_file, excel_buffer = export
                         st.success(f"✅ Calendar exported successfully!")
                         st.info(f"📄 File: {excel_file}")
                         
-                        # Provide download link if file exists
-                        file_path = f"exports/{excel_file}"
-                        if os.path.exists(file_path):
-                            with open(file_path, "rb") as file:
-                                st.download_button(
-                                    label="⬇️ Download Excel File",
-                                    data=file.read(),
-                                    file_name=excel_file,
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                )
+                        # The workbook is built in memory, so serve it straight from the buffer
+                        st.download_button(
+                            label="⬇️ Download Excel File",
+                            data=excel_buffer.getvalue(),
+                            file_name=excel_file,
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        )
                     else:
                         st.error("❌ Export failed")
         
@@ -1,23 +1,260 @@
 import sqlite3
-import pandas as pd
 from datetime import datetime, timedelta
-import schedule
-import time
+import math
+import smtplib
 import threading
-from communication import CommunicationManager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from communication import CommunicationManager, MAX_MESSAGES_PER_SMTP_SESSION
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import os
 
+# Number of SMTP sessions sending a reminder batch in parallel
+REMINDER_CONCURRENCY = max(1, int(os.environ.get("REMINDER_CONCURRENCY", "5")))
+
+# Due reminders read, sent and recorded per round, so a large backlog never sits in memory at once
+REMINDER_BATCH_SIZE = 200
+
+# Times a worker reopens its SMTP session after the server drops it mid-chunk;
+# whatever is still unsent after that stays pending for the next run
+SMTP_RECONNECTS = 1
+
+# Hot statements, kept as constants so each connection's statement cache reuses the
+# prepared plan instead of re-parsing the SQL on every call
+_SQL_PENDING_REMINDERS = """
+    SELECT r.reminder_id, r.appointment_id, r.patient_id, r.reminder_type, r.scheduled_time,
+           p.first_name, p.last_name, p.email, p.phone,
+           a.appointment_date, a.appointment_time, d.doctor_name, d.specialty
+    FROM reminders r
+    JOIN patients p ON r.patient_id = p.patient_id
+    JOIN appointments a ON r.appointment_id = a.appointment_id
+    JOIN doctors d ON a.doctor_id = d.doctor_id
+    WHERE r.status = 'pending' AND r.scheduled_time <= ?
+    AND (r.scheduled_time, r.reminder_id) > (?, ?)
+    ORDER BY r.scheduled_time, r.reminder_id
+    LIMIT ?
+"""
+_SQL_MARK_SENT = "UPDATE reminders SET status = 'sent', sent_time = ? WHERE reminder_id = ?"
+_SQL_MARK_FAILED = "UPDATE reminders SET status = 'failed', sent_time = ?, response = ? WHERE reminder_id = ?"
+_SQL_INSERT_REMINDER = """
+    INSERT INTO reminders (
+        appointment_id, patient_id, reminder_type, 
+        reminder_method, scheduled_time, status
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Reminder email bodies, filled from the reminder row with str.format_map
+_INITIAL_TMPL = """
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #2c5aa0;">Appointment Reminder</h2>
+            
+            <p>Dear {first_name} {last_name},</p>
+            
+            <p>This is a friendly reminder about your upcoming appointment at MediCare Allergy & Wellness Center.</p>
+            
+            <div style="background-color: #e8f4fd; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h3 style="margin-top: 0; color: #2c5aa0;">📅 Appointment Details:</h3>
+                <p><strong>Date:</strong> {appointment_date}</p>
+                <p><strong>Time:</strong> {appointment_time}</p>
+                <p><strong>Doctor:</strong> Dr. {doctor_name}</p>
+                <p><strong>Specialty:</strong> {specialty}</p>
+            </div>
+            
+            <div style="background-color: #fff3cd; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                <h4 style="margin-top: 0; color: #856404;">📋 Please Remember:</h4>
+                <ul>
+                    <li>Arrive 15 minutes early for check-in</li>
+                    <li>Bring your insurance card and ID</li>
+                    <li>Complete any required forms</li>
+                    <li>Bring a list of current medications</li>
+                </ul>
+            </div>
+            
+            <p>If you need to reschedule or cancel, please call us at <strong>(555) 123-4567</strong></p>
+            
+            <p style="margin-top: 30px; color: #666; font-size: 0.9em;">
+                Thank you for choosing MediCare!<br>
+                <em>This is an automated reminder. Please do not reply to this email.</em>
+            </p>
+        </div>
+    </body>
+    </html>
+"""
+
+_FOLLOWUP1_TMPL = """
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #e67e22;">Your Appointment is Tomorrow! 📅</h2>
+            
+            <p>Dear {first_name} {last_name},</p>
+            
+            <p>This is a friendly reminder that your appointment is scheduled for <strong>tomorrow</strong>.</p>
+            
+            <div style="background-color: #e8f4fd; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h3 style="margin-top: 0; color: #2c5aa0;">📅 Appointment Details:</h3>
+                <p><strong>Date:</strong> {appointment_date} (Tomorrow)</p>
+                <p><strong>Time:</strong> {appointment_time}</p>
+                <p><strong>Doctor:</strong> Dr. {doctor_name}</p>
+                <p><strong>Specialty:</strong> {specialty}</p>
+            </div>
+            
+            <div style="background-color: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h4 style="margin-top: 0; color: #856404;">❓ Action Required - Please Confirm:</h4>
+                <ol>
+                    <li><strong>Have you filled the forms?</strong><br>
+                        <small>Please complete your intake forms if you haven't already</small>
+                    </li>
+                    <li><strong>Is your visit confirmed or not?</strong><br>
+                        <small>If not, please mention the reason for cancellation by calling (555) 123-4567</small>
+                    </li>
+                </ol>
+                <p style="margin-top: 15px; font-weight: bold; color: #d9534f;">
+                    📞 Please call us at (555) 123-4567 if you need to cancel or have any concerns.
+                </p>
+            </div>
+            
+            <div style="background-color: #d4edda; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                <h4 style="margin-top: 0; color: #155724;">✅ Final Reminders:</h4>
+                <ul>
+                    <li>Arrive 15 minutes early</li>
+                    <li>Bring insurance card and photo ID</li>
+                    <li>Complete forms if not already done</li>
+                    <li>Bring current medication list</li>
+                </ul>
+            </div>
+            
+            <p style="text-align: center; margin: 30px 0;">
+                <a href="tel:555-123-4567" style="background-color: #e67e22; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">📞 Call if Changes Needed</a>
+            </p>
+            
+            <p style="margin-top: 30px; color: #666; font-size: 0.9em;">
+                Thank you for choosing MediCare!<br>
+                <em>This is an automated reminder. Please call us for any changes.</em>
+            </p>
+        </div>
+    </body>
+    </html>
+"""
+
+_FOLLOWUP2_TMPL = """
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #dc3545;">⏰ Your Appointment is in 2 Hours!</h2>
+            
+            <p>Dear {first_name} {last_name},</p>
+            
+            <p>This is your final reminder - your appointment is scheduled in approximately <strong>2 hours</strong>.</p>
+            
+            <div style="background-color: #f8d7da; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #dc3545;">
+                <h3 style="margin-top: 0; color: #721c24;">🚨 URGENT - Appointment Details:</h3>
+                <p><strong>TODAY at {appointment_time}</strong></p>
+                <p><strong>Doctor:</strong> Dr. {doctor_name}</p>
+                <p><strong>Location:</strong> MediCare Allergy & Wellness Center</p>
+            </div>
+            
+            <div style="background-color: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h4 style="margin-top: 0; color: #856404;">🔍 Action Required - Final Confirmation:</h4>
+                <ol>
+                    <li><strong>Have you filled the forms?</strong><br>
+                        <small>⚠️ Incomplete forms may delay your appointment</small>
+                    </li>
+                    <li><strong>Is your visit confirmed or not?</strong><br>
+                        <small>If not, please mention the reason for cancellation by calling NOW: (555) 123-4567</small>
+                    </li>
+                </ol>
+                <p style="margin-top: 15px; font-weight: bold; color: #d9534f;">
+                    📞 URGENT: Call (555) 123-4567 immediately if you need to cancel or have concerns.
+                </p>
+            </div>
+            
+            <div style="background-color: #d1ecf1; padding: 15px; border-radius: 8px; margin: 20px 0;">
+                <h4 style="margin-top: 0; color: #0c5460;">📍 What to Bring:</h4>
+                <ul>
+                    <li>✅ Photo ID</li>
+                    <li>✅ Insurance card</li>
+                    <li>✅ Completed forms</li>
+                    <li>✅ Current medications list</li>
+                    <li>✅ Payment method for copay</li>
+                </ul>
+            </div>
+            
+            <p style="text-align: center; margin: 30px 0;">
+                <a href="tel:555-123-4567" style="background-color: #dc3545; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">🚨 URGENT: Call if Canceling</a>
+            </p>
+            
+            <p style="margin-top: 30px; color: #666; font-size: 0.9em; text-align: center;">
+                <strong>MediCare Allergy & Wellness Center</strong><br>
+                📍 123 Medical Plaza, Health City<br>
+                📞 (555) 123-4567<br>
+                <em>See you soon!</em>
+            </p>
+        </div>
+    </body>
+    </html>
+"""
+
+# reminder_type -> (email subject, body template)
+_REMINDER_TEMPLATES = {
+    'initial': ("🏥 Appointment Reminder - MediCare Allergy & Wellness Center", _INITIAL_TMPL),
+    'follow_up_1': ("🔔 Tomorrow's Appointment - MediCare (Action Required)", _FOLLOWUP1_TMPL),
+    'follow_up_2': ("⏰ Final Reminder - Your Appointment is in 2 Hours!", _FOLLOWUP2_TMPL),
+}
+
 class AutomatedReminderSystem:
     def __init__(self, db_path="data/medical_scheduler.db"):
         self.db_path = db_path
         self.comm_manager = CommunicationManager()
         self.running = False
+        self._stop_event = threading.Event()
+        # Side-channel sends (e.g. the follow-up 2 SMS) run here so they overlap the email
+        self._io_pool = ThreadPoolExecutor(max_workers=4)
         
         # Debug flag for testing
         self.debug_mode = True
         
+        # One persistent connection per thread (scheduler, Streamlit script runs), opened on first use
+        self._local = threading.local()
+        
+        self._ensure_schema()
+        
+    def _connect(self):
+        """Open a database connection tuned for the scheduler and the web UI sharing the file"""
+        # Autocommit mode; multi-statement writes open their own BEGIN
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+        return conn
+        
+    def _ensure_schema(self):
+        """Create the index behind the pending-reminder query if it's missing"""
+        try:
+            # Same name as DatabaseManager's index, so whichever runs first wins
+            self._get_conn().execute(
+                "CREATE INDEX IF NOT EXISTS ix_reminders_status_sched ON reminders(status, scheduled_time)"
+            )
+        except Exception as e:
+            self.log_debug(f"Could not create reminder index: {e}")
+        
+    def _get_conn(self):
+        """This thread's persistent database connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+        
+    def _rollback(self):
+        """Roll back an unfinished transaction on this thread's connection after an error"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+        
     def log_debug(self, message):
         """Debug logging for troubleshooting"""
         if self.debug_mode:
@@ -46,274 +283,208 @@ class AutomatedReminderSystem:
             self.log_debug(f"Email configuration error: {e}")
             return False
             
+    def _next_hour(self, after):
+        """Top of the hour following `after`"""
+        return after.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            
     def start_scheduler(self):
         """Start the automated reminder scheduler"""
-        # Schedule checks every hour
-        schedule.every().hour.do(self.check_and_send_reminders)
-        
+        self._stop_event.clear()
         self.running = True
         print("🤖 Automated Reminder System Started!")
         print("⏰ Checking for reminders every hour...")
         
-        while self.running:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        # Sleep until the next hour instead of polling every minute;
+        # stop_scheduler sets the event and ends the wait immediately
+        next_run = self._next_hour(datetime.now())
+        while not self._stop_event.wait(timeout=max(0, (next_run - datetime.now()).total_seconds())):
+            self.check_and_send_reminders()
+            # Step from the slot just served (never the same hour twice, even if the
+            # wait woke a hair early), skipping any hours a long run overran
+            next_run = max(self._next_hour(next_run), self._next_hour(datetime.now()))
             
     def stop_scheduler(self):
         """Stop the scheduler"""
         self.running = False
-        schedule.clear()
+        self._stop_event.set()
         print("⏹️ Automated Reminder System Stopped!")
         
     def check_and_send_reminders(self):
         """Check for pending reminders and send them"""
         current_time = datetime.now()
+        # One timestamp for the due-check and every status update in this run
+        now_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_conn()
         
-        # Get pending reminders that are due (including overdue ones for testing)
-        query = """
-            SELECT r.*, p.first_name, p.last_name, p.email, p.phone,
-                   a.appointment_date, a.appointment_time, d.doctor_name, d.specialty
-            FROM reminders r
-            JOIN patients p ON r.patient_id = p.patient_id
-            JOIN appointments a ON r.appointment_id = a.appointment_id
-            JOIN doctors d ON a.doctor_id = d.doctor_id
-            WHERE r.status = 'pending' 
-            ORDER BY r.scheduled_time
-        """
+        # Plain dicts keep the reminder['...'] / .get() access the senders use
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        def due_page(after):
+            return [dict(row) for row in cursor.execute(
+                _SQL_PENDING_REMINDERS, (now_str, *after, REMINDER_BATCH_SIZE)
+            ).fetchall()]
+        
+        # Walk the due reminders (overdue ones included) in pages keyed on
+        # (scheduled_time, reminder_id). Each page is a fresh query, so the status
+        # updates written between pages never race an open SELECT, and rows left
+        # pending by a failed SMTP login aren't picked up again in this run.
+        reminders = due_page(('', 0))
+        
+        # Most hourly ticks have nothing due: stop after the one index probe,
+        # before any config check, worker pool or SMTP login
+        if not reminders:
+            self.log_debug("No pending reminders due")
+            return
+        
+        # Email settings don't change within a batch; check them once up front
+        if not self.test_email_config():
+            print("❌ Email configuration test failed; skipping this reminder run")
+            return
         
-        reminders_df = pd.read_sql_query(query, conn)
+        with ThreadPoolExecutor(max_workers=REMINDER_CONCURRENCY) as pool:
+            while reminders:
+                print(f"📋 Found {len(reminders)} pending reminders to send...")
+                self._send_batch(reminders, pool, now_str)
+                reminders = due_page((reminders[-1]['scheduled_time'], reminders[-1]['reminder_id']))
         
-        print(f"📋 Found {len(reminders_df)} pending reminders to send...")
+    def _send_batch(self, reminders, pool, now_str):
+        """Send one page of reminders and record the results in one transaction"""
+        # Spread the batch over parallel SMTP sessions, each carrying at most
+        # MAX_MESSAGES_PER_SMTP_SESSION emails. Workers only send; the database
+        # is updated from this thread.
+        n_sessions = max(math.ceil(len(reminders) / MAX_MESSAGES_PER_SMTP_SESSION),
+                         min(REMINDER_CONCURRENCY, len(reminders)))
+        chunks = [reminders[i::n_sessions] for i in range(n_sessions)]
         
-        for _, reminder in reminders_df.iterrows():
+        sent_rows = []
+        failed_rows = []
+        futures = [pool.submit(self._dispatch_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for reminder, error in future.result():
+                if error is None:
+                    sent_rows.append((now_str, reminder['reminder_id']))
+                    print(f"✅ Sent {reminder['reminder_type']} reminder to {reminder['first_name']} {reminder['last_name']}")
+                else:
+                    print(f"❌ Error sending reminder {reminder['reminder_id']}: {error}")
+                    failed_rows.append((now_str, error, reminder['reminder_id']))
+        
+        if sent_rows or failed_rows:
+            conn = self._get_conn()
             try:
-                if reminder['reminder_type'] == 'initial':
-                    self.send_initial_reminder(reminder)
-                elif reminder['reminder_type'] == 'follow_up_1':
-                    self.send_follow_up_1_reminder(reminder)
-                elif reminder['reminder_type'] == 'follow_up_2':
-                    self.send_follow_up_2_reminder(reminder)
-                
-                # Mark as sent
-                self.mark_reminder_sent(reminder['reminder_id'])
-                print(f"✅ Sent {reminder['reminder_type']} reminder to {reminder['first_name']} {reminder['last_name']}")
-                
+                conn.execute("BEGIN")
+                conn.executemany(_SQL_MARK_SENT, sent_rows)
+                conn.executemany(_SQL_MARK_FAILED, failed_rows)
+                conn.commit()
             except Exception as e:
-                print(f"❌ Error sending reminder {reminder['reminder_id']}: {e}")
-                self.mark_reminder_failed(reminder['reminder_id'], str(e))
+                self._rollback()
+                print(f"Error updating reminder statuses: {e}")
         
-        conn.close()
+    def _dispatch_chunk(self, reminders):
+        """
+        Send a slice of reminders over one SMTP session; returns (reminder, error) pairs
         
-    def send_initial_reminder(self, reminder):
-        """Send initial reminder (3 days before)"""
+        error is None for a sent reminder. Reminders missing from the result were
+        never attempted (connection lost) and stay pending.
+        """
+        results = []
+        sms_futures = []
+        pending = list(reminders)
+        for _ in range(SMTP_RECONNECTS + 1):
+            try:
+                with self.comm_manager.smtp_session() as smtp:
+                    while pending:
+                        reminder = pending[0]
+                        if reminder['reminder_type'] in _REMINDER_TEMPLATES:
+                            ok, error = self._send_reminder(reminder, reminder['reminder_type'], smtp)
+                        else:
+                            ok, error = False, f"Unknown reminder type: {reminder['reminder_type']}"
+                        
+                        # A dropped session fails this and every later send; reconnect
+                        # and retry from this reminder instead of failing the rest
+                        if not ok and not self._smtp_alive(smtp):
+                            print(f"⚠️ SMTP session dropped: {error}")
+                            break
+                        
+                        pending.pop(0)
+                        results.append((reminder, None if ok else error))
+                        
+                        # Only now is the email outcome final, so a retried send
+                        # can't text the patient twice
+                        if reminder['reminder_type'] == 'follow_up_2':
+                            sms_futures.append(self._io_pool.submit(self._send_urgent_sms, reminder))
+            except Exception as e:
+                # Couldn't connect or log in; anything not sent stays pending for the next run
+                print(f"❌ SMTP connection error: {e}")
+                break
+            if not pending:
+                break
+        for future in sms_futures:
+            future.result()
+        return results
+        
+    def _smtp_alive(self, smtp):
+        """Whether the SMTP session still answers"""
         try:
-            self.log_debug(f"Sending initial reminder for appointment {reminder.get('appointment_id', 'N/A')}")
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+        
+    def _send_email(self, to_email, subject, body, smtp=None):
+        """Send over the batch's SMTP session when given one, otherwise on a fresh connection"""
+        if smtp is not None:
+            return self.comm_manager.send_email_on(smtp, to_email, subject, body)
+        return self.comm_manager.send_email(to_email, subject, body)
+        
+    def _send_reminder(self, reminder, kind, smtp=None):
+        """Render and send the `kind` reminder email; returns (ok, message)"""
+        try:
+            if self.debug_mode:
+                self.log_debug(f"Sending {kind} reminder for appointment {reminder.get('appointment_id', 'N/A')}")
             
-            # Test email configuration first
-            if not self.test_email_config():
+            # Batch senders (those passing an SMTP session) have already checked the
+            # email configuration once for the whole batch
+            if smtp is None and not self.test_email_config():
                 self.log_debug("Email configuration test failed")
-                return False
+                return False, "Email configuration test failed"
             
-            subject = "🏥 Appointment Reminder - MediCare Allergy & Wellness Center"
+            subject, template = _REMINDER_TEMPLATES[kind]
+            email_body = template.format_map(reminder)
             
-            email_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #2c5aa0;">Appointment Reminder</h2>
-                    
-                    <p>Dear {reminder['first_name']} {reminder['last_name']},</p>
-                    
-                    <p>This is a friendly reminder about your upcoming appointment at MediCare Allergy & Wellness Center.</p>
-                    
-                    <div style="background-color: #e8f4fd; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="margin-top: 0; color: #2c5aa0;">📅 Appointment Details:</h3>
-                        <p><strong>Date:</strong> {reminder['appointment_date']}</p>
-                        <p><strong>Time:</strong> {reminder['appointment_time']}</p>
-                        <p><strong>Doctor:</strong> Dr. {reminder['doctor_name']}</p>
-                        <p><strong>Specialty:</strong> {reminder['specialty']}</p>
-                    </div>
-                    
-                    <div style="background-color: #fff3cd; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                        <h4 style="margin-top: 0; color: #856404;">📋 Please Remember:</h4>
-                        <ul>
-                            <li>Arrive 15 minutes early for check-in</li>
-                            <li>Bring your insurance card and ID</li>
-                            <li>Complete any required forms</li>
-                            <li>Bring a list of current medications</li>
-                        </ul>
-                    </div>
-                    
-                    <p>If you need to reschedule or cancel, please call us at <strong>(555) 123-4567</strong></p>
-                    
-                    <p style="margin-top: 30px; color: #666; font-size: 0.9em;">
-                        Thank you for choosing MediCare!<br>
-                        <em>This is an automated reminder. Please do not reply to this email.</em>
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            self.log_debug(f"Sending email to: {reminder['email']}")
-            success = self.comm_manager.send_email(reminder['email'], subject, email_body)
+            success, message = self._send_email(reminder['email'], subject, email_body, smtp)
             
-            if success:
-                self.log_debug(f"Initial reminder email sent successfully to {reminder['email']}")
-            else:
-                self.log_debug(f"Failed to send initial reminder email to {reminder['email']}")
-                
-            return success
+            if self.debug_mode:
+                if success:
+                    self.log_debug(f"{kind} reminder email sent successfully to {reminder['email']}")
+                else:
+                    self.log_debug(f"Failed to send {kind} reminder email to {reminder['email']}: {message}")
+            
+            return success, message
             
         except Exception as e:
-            self.log_debug(f"Error sending initial reminder: {e}")
-            return False
+            self.log_debug(f"Error sending {kind} reminder: {e}")
+            return False, f"Error sending {kind} reminder: {e}"
 
-    def send_follow_up_1_reminder(self, reminder):
+    def send_initial_reminder(self, reminder, smtp=None):
+        """Send initial reminder (3 days before)"""
+        return self._send_reminder(reminder, 'initial', smtp)[0]
+
+    def send_follow_up_1_reminder(self, reminder, smtp=None):
         """Send follow-up reminder 1 (1 day before) - Ask about forms and confirmation"""
-        try:
-            subject = "🔔 Tomorrow's Appointment - MediCare (Action Required)"
-            
-            email_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #e67e22;">Your Appointment is Tomorrow! 📅</h2>
-                    
-                    <p>Dear {reminder['first_name']} {reminder['last_name']},</p>
-                    
-                    <p>This is a friendly reminder that your appointment is scheduled for <strong>tomorrow</strong>.</p>
-                    
-                    <div style="background-color: #e8f4fd; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="margin-top: 0; color: #2c5aa0;">📅 Appointment Details:</h3>
-                        <p><strong>Date:</strong> {reminder['appointment_date']} (Tomorrow)</p>
-                        <p><strong>Time:</strong> {reminder['appointment_time']}</p>
-                        <p><strong>Doctor:</strong> Dr. {reminder['doctor_name']}</p>
-                        <p><strong>Specialty:</strong> {reminder['specialty']}</p>
-                    </div>
-                    
-                    <div style="background-color: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h4 style="margin-top: 0; color: #856404;">❓ Action Required - Please Confirm:</h4>
-                        <ol>
-                            <li><strong>Have you filled the forms?</strong><br>
-                                <small>Please complete your intake forms if you haven't already</small>
-                            </li>
-                            <li><strong>Is your visit confirmed or not?</strong><br>
-                                <small>If not, please mention the reason for cancellation by calling (555) 123-4567</small>
-                            </li>
-                        </ol>
-                        <p style="margin-top: 15px; font-weight: bold; color: #d9534f;">
-                            📞 Please call us at (555) 123-4567 if you need to cancel or have any concerns.
-                        </p>
-                    </div>
-                    
-                    <div style="background-color: #d4edda; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                        <h4 style="margin-top: 0; color: #155724;">✅ Final Reminders:</h4>
-                        <ul>
-                            <li>Arrive 15 minutes early</li>
-                            <li>Bring insurance card and photo ID</li>
-                            <li>Complete forms if not already done</li>
-                            <li>Bring current medication list</li>
-                        </ul>
-                    </div>
-                    
-                    <p style="text-align: center; margin: 30px 0;">
-                        <a href="tel:555-123-4567" style="background-color: #e67e22; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">📞 Call if Changes Needed</a>
-                    </p>
-                    
-                    <p style="margin-top: 30px; color: #666; font-size: 0.9em;">
-                        Thank you for choosing MediCare!<br>
-                        <em>This is an automated reminder. Please call us for any changes.</em>
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            success = self.comm_manager.send_email(reminder['email'], subject, email_body)
-            return success
-            
-        except Exception as e:
-            print(f"Error sending follow-up 1 reminder: {e}")
-            return False
+        return self._send_reminder(reminder, 'follow_up_1', smtp)[0]
 
-    def send_follow_up_2_reminder(self, reminder):
+    def send_follow_up_2_reminder(self, reminder, smtp=None):
         """Send follow-up reminder 2 (2 hours before) - Final confirmation"""
-        try:
-            subject = "⏰ Final Reminder - Your Appointment is in 2 Hours!"
-            
-            email_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #dc3545;">⏰ Your Appointment is in 2 Hours!</h2>
-                    
-                    <p>Dear {reminder['first_name']} {reminder['last_name']},</p>
-                    
-                    <p>This is your final reminder - your appointment is scheduled in approximately <strong>2 hours</strong>.</p>
-                    
-                    <div style="background-color: #f8d7da; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #dc3545;">
-                        <h3 style="margin-top: 0; color: #721c24;">🚨 URGENT - Appointment Details:</h3>
-                        <p><strong>TODAY at {reminder['appointment_time']}</strong></p>
-                        <p><strong>Doctor:</strong> Dr. {reminder['doctor_name']}</p>
-                        <p><strong>Location:</strong> MediCare Allergy & Wellness Center</p>
-                    </div>
-                    
-                    <div style="background-color: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h4 style="margin-top: 0; color: #856404;">🔍 Action Required - Final Confirmation:</h4>
-                        <ol>
-                            <li><strong>Have you filled the forms?</strong><br>
-                                <small>⚠️ Incomplete forms may delay your appointment</small>
-                            </li>
-                            <li><strong>Is your visit confirmed or not?</strong><br>
-                                <small>If not, please mention the reason for cancellation by calling NOW: (555) 123-4567</small>
-                            </li>
-                        </ol>
-                        <p style="margin-top: 15px; font-weight: bold; color: #d9534f;">
-                            📞 URGENT: Call (555) 123-4567 immediately if you need to cancel or have concerns.
-                        </p>
-                    </div>
-                    
-                    <div style="background-color: #d1ecf1; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                        <h4 style="margin-top: 0; color: #0c5460;">📍 What to Bring:</h4>
-                        <ul>
-                            <li>✅ Photo ID</li>
-                            <li>✅ Insurance card</li>
-                            <li>✅ Completed forms</li>
-                            <li>✅ Current medications list</li>
-                            <li>✅ Payment method for copay</li>
-                        </ul>
-                    </div>
-                    
-                    <p style="text-align: center; margin: 30px 0;">
-                        <a href="tel:555-123-4567" style="background-color: #dc3545; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">🚨 URGENT: Call if Canceling</a>
-                    </p>
-                    
-                    <p style="margin-top: 30px; color: #666; font-size: 0.9em; text-align: center;">
-                        <strong>MediCare Allergy & Wellness Center</strong><br>
-                        📍 123 Medical Plaza, Health City<br>
-                        📞 (555) 123-4567<br>
-                        <em>See you soon!</em>
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            success = self.comm_manager.send_email(reminder['email'], subject, email_body)
-            
-            # Also send SMS for urgent reminder
-            if reminder.get('phone'):
-                sms_message = f"🚨 REMINDER: Your appointment with Dr. {reminder['doctor_name']} is in 2 HOURS at {reminder['appointment_time']}. Please call (555) 123-4567 if you need to cancel. - MediCare"
-                self.send_sms_reminder(reminder, sms_message)
-            
-            return success
-            
-        except Exception as e:
-            print(f"Error sending follow-up 2 reminder: {e}")
-            return False
+        success = self._send_reminder(reminder, 'follow_up_2', smtp)[0]
+        self._send_urgent_sms(reminder)
+        return success
+
+    def _send_urgent_sms(self, reminder):
+        """The final reminder also goes out by SMS when there's a phone number"""
+        if reminder.get('phone'):
+            sms_message = f"🚨 REMINDER: Your appointment with Dr. {reminder['doctor_name']} is in 2 HOURS at {reminder['appointment_time']}. Please call (555) 123-4567 if you need to cancel. - MediCare"
+            self.send_sms_reminder(reminder, sms_message)
 
     def send_sms_reminder(self, appointment_data, custom_message=None):
         """Send SMS reminder using Twilio"""
@@ -343,17 +514,10 @@ class AutomatedReminderSystem:
     def mark_reminder_sent(self, reminder_id):
         """Mark reminder as sent in database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_conn()
             cursor = conn.cursor()
             
-            cursor.execute("""
-                UPDATE reminders 
-                SET status = 'sent', sent_time = ? 
-                WHERE reminder_id = ?
-            """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), reminder_id))
-            
-            conn.commit()
-            conn.close()
+            cursor.execute(_SQL_MARK_SENT, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), reminder_id))
             
         except Exception as e:
             print(f"Error marking reminder as sent: {e}")
@@ -361,17 +525,10 @@ class AutomatedReminderSystem:
     def mark_reminder_failed(self, reminder_id, error_message):
         """Mark reminder as failed in database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_conn()
             cursor = conn.cursor()
             
-            cursor.execute("""
-                UPDATE reminders 
-                SET status = 'failed', sent_time = ?, response = ? 
-                WHERE reminder_id = ?
-            """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), error_message, reminder_id))
-            
-            conn.commit()
-            conn.close()
+            cursor.execute(_SQL_MARK_FAILED, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), error_message, reminder_id))
             
         except Exception as e:
             print(f"Error marking reminder as failed: {e}")
@@ -411,7 +568,7 @@ class AutomatedReminderSystem:
             # followup_1_reminder_time = appointment_datetime - timedelta(days=1)
             # followup_2_reminder_time = appointment_datetime - timedelta(hours=2)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_conn()
             cursor = conn.cursor()
             
             reminders = [
@@ -420,40 +577,43 @@ class AutomatedReminderSystem:
                 ('follow_up_2', followup_2_reminder_time)
             ]
             
-            for reminder_type, reminder_time in reminders:
-                cursor.execute("""
-                    INSERT INTO reminders (
-                        appointment_id, patient_id, reminder_type, 
-                        reminder_method, scheduled_time, status
-                    ) VALUES (?, ?, ?, ?, ?, ?)
-                """, (
+            cursor.execute("BEGIN")
+            cursor.executemany(_SQL_INSERT_REMINDER, [
+                (
                     appointment_data['appointment_id'],
                     appointment_data['patient_id'],
                     reminder_type,
                     'email',
                     reminder_time.strftime('%Y-%m-%d %H:%M:%S'),
                     'pending'
-                ))
-            
+                )
+                for reminder_type, reminder_time in reminders
+            ])
             conn.commit()
-            conn.close()
             
             self.log_debug(f"Scheduled 3 reminders for appointment {appointment_data['appointment_id']}")
             return True
             
         except Exception as e:
+            self._rollback()
             self.log_debug(f"Error scheduling reminders: {e}")
             return False
 
     def send_pending_reminders_now(self):
         """Send all pending reminders immediately for testing"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            if not self.test_email_config():
+                self.log_debug("Email configuration test failed; not sending pending reminders")
+                return False
+            
+            conn = self._get_conn()
             cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             
             # Get all pending reminders
             cursor.execute("""
-                SELECT r.*, p.first_name, p.last_name, p.email, p.phone,
+                SELECT r.reminder_id, r.appointment_id, r.patient_id, r.reminder_type,
+                       p.first_name, p.last_name, p.email, p.phone,
                        a.appointment_date, a.appointment_time, d.doctor_name
                 FROM reminders r
                 JOIN appointments a ON r.appointment_id = a.appointment_id
@@ -471,25 +631,25 @@ class AutomatedReminderSystem:
             
             self.log_debug(f"Found {len(reminders)} pending reminders")
             
+            now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute("BEGIN")
             for reminder in reminders:
-                reminder_id = reminder[0]
-                appointment_id = reminder[1]
-                patient_id = reminder[2]
-                reminder_type = reminder[3]
+                reminder_id = reminder['reminder_id']
+                reminder_type = reminder['reminder_type']
                 
                 # Extract patient info
                 patient_info = {
-                    'first_name': reminder[10],
-                    'last_name': reminder[11],
-                    'email': reminder[12],
-                    'phone': reminder[13]
+                    'first_name': reminder['first_name'],
+                    'last_name': reminder['last_name'],
+                    'email': reminder['email'],
+                    'phone': reminder['phone']
                 }
                 
                 # Extract appointment info
                 appointment_info = {
-                    'date': reminder[14],
-                    'time': reminder[15],
-                    'doctor_name': reminder[16]
+                    'date': reminder['appointment_date'],
+                    'time': reminder['appointment_time'],
+                    'doctor_name': reminder['doctor_name']
                 }
                 
                 self.log_debug(f"Sending {reminder_type} reminder to {patient_info['first_name']} {patient_info['last_name']}")
@@ -499,21 +659,17 @@ class AutomatedReminderSystem:
                 
                 if result.get('email') or result.get('sms'):
                     # Mark as sent
-                    cursor.execute("""
-                        UPDATE reminders 
-                        SET status = 'sent', sent_time = ? 
-                        WHERE reminder_id = ?
-                    """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), reminder_id))
+                    cursor.execute(_SQL_MARK_SENT, (now_str, reminder_id))
                     
                     self.log_debug(f"✅ {reminder_type} reminder sent successfully")
                 else:
                     self.log_debug(f"❌ Failed to send {reminder_type} reminder")
             
             conn.commit()
-            conn.close()
             
             return True
             
         except Exception as e:
+            self._rollback()
             self.log_debug(f"Error sending pending reminders: {e}")
             return False
@@ -5,15 +5,109 @@ Manages appointment scheduling, calendar slots, and Excel export integration
 """
 
 import sqlite3
-import pandas as pd
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone
 import json
 import uuid
 import os
+import io
 from typing import Dict, List, Optional, Tuple
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 import calendar
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from functools import lru_cache
+from time import monotonic
+
+# Seconds a doctor's generated slots are reused before hitting the database again
+SLOT_CACHE_TTL = 60
+
+# (doctor_id, start_date, days_ahead) -> (expires_at, slots), shared by every
+# CalendarIntegration in the process so one booking invalidates them all
+_slot_cache = {}
+_slot_cache_lock = threading.Lock()
+# Bumped on every invalidation, so slots computed before a booking are never stored after it
+_slot_cache_generation = 0
+
+def invalidate_availability(doctor_id=None):
+    """Forget cached slots for a doctor (or every doctor) after appointments change"""
+    global _slot_cache_generation
+    with _slot_cache_lock:
+        _slot_cache_generation += 1
+        if doctor_id is None:
+            _slot_cache.clear()
+            return
+        for key in [k for k in _slot_cache if str(k[0]) == str(doctor_id)]:
+            del _slot_cache[key]
+
+# Length of each appointment in the calendar views and exports
+CALENDAR_EVENT_MINUTES = 30
+
+# Full calendar export columns
+_CALENDAR_EXPORT_HEADERS = [
+    "Appointment ID", "Date", "Time", "Patient Name", "Patient Email",
+    "Patient Phone", "Doctor", "Specialty", "Duration", "Status"
+]
+
+# Longest value per export column (Duration is constant), so widths can be set
+# before rows are streamed; mirrors the values export_full_calendar_excel writes
+_SQL_CALENDAR_COLUMN_LENGTHS = """
+    SELECT MAX(LENGTH(a.appointment_id)),
+           MAX(LENGTH(a.appointment_date)),
+           MAX(LENGTH(strftime('%H:%M', a.appointment_date || ' ' || a.appointment_time))),
+           MAX(LENGTH(p.first_name || ' ' || p.last_name)),
+           MAX(LENGTH(p.email)),
+           MAX(LENGTH(p.phone)),
+           MAX(LENGTH('Dr. ' || d.doctor_name)),
+           MAX(LENGTH(d.specialty)),
+           NULL,
+           MAX(LENGTH(a.status))
+    FROM appointments a
+    LEFT JOIN patients p ON a.patient_id = p.patient_id
+    LEFT JOIN doctors d ON a.doctor_id = d.doctor_id
+"""
+
+# Shared openpyxl styles, created once rather than per cell
+_BOLD_FONT = Font(bold=True)
+_THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+# iCalendar event for one appointment; times are floating (clinic local time)
+_ICS_TEMPLATE = "\r\n".join([
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    "PRODID:-//MediCare Allergy & Wellness Center//Scheduler//EN",
+    "BEGIN:VEVENT",
+    "UID:{uid}",
+    "DTSTAMP:{stamp}",
+    "DTSTART:{start}",
+    "DTEND:{end}",
+    "SUMMARY:{summary}",
+    "DESCRIPTION:{description}",
+    "LOCATION:{location}",
+    "END:VEVENT",
+    "END:VCALENDAR",
+    ""
+])
+
+_SQL_INSERT_APPOINTMENT = """
+    INSERT INTO appointments (
+        patient_id, doctor_id, appointment_date, 
+        appointment_time, duration, appointment_type, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+@lru_cache(maxsize=64)
+def _month_grid(year: int, month: int) -> Tuple[str, Tuple[Tuple[int, ...], ...]]:
+    """Month name and Monday-first week rows (0 = padding day) for the mini calendar"""
+    return calendar.month_name[month], tuple(tuple(week) for week in calendar.monthcalendar(year, month))
 
 class CalendarIntegration:
     """Enhanced calendar integration with Calendly-style features"""
@@ -39,10 +133,76 @@ class CalendarIntegration:
         
         # Days of week (0=Monday, 6=Sunday)
         self.working_days = [0, 1, 2, 3, 4]  # Monday to Friday
+        self._working_days_set = frozenset(self.working_days)
+        
+        # Every working day has the same slot times, so lay them out once:
+        # (HH:MM, HH:MM:SS for the ISO timestamp, 12-hour display time)
+        self._slot_templates = self._build_slot_templates()
+        
+        # One persistent connection per thread (Streamlit script runs share this object)
+        self._local = threading.local()
+        
+        # Booking confirmations don't wait for their .xlsx; it's written here
+        self._export_pool = ThreadPoolExecutor(max_workers=2)
+        
+        self._ensure_indexes()
+        
+    def _build_slot_templates(self) -> List[Tuple[str, str, str]]:
+        """Slot start times for one working day, skipping the lunch hour"""
+        templates = []
+        day = datetime.min.date()
+        current_time = datetime.combine(day, self.working_hours['start_time'])
+        end_time = datetime.combine(day, self.working_hours['end_time'])
+        lunch_start = datetime.combine(day, self.working_hours['lunch_start'])
+        lunch_end = datetime.combine(day, self.working_hours['lunch_end'])
+        
+        while current_time + timedelta(minutes=self.slot_duration) <= end_time:
+            # Skip lunch hour
+            if lunch_start <= current_time < lunch_end:
+                current_time = lunch_end
+                continue
+            
+            templates.append((
+                current_time.strftime('%H:%M'),
+                current_time.strftime('%H:%M:%S'),
+                current_time.strftime('%I:%M %p')
+            ))
+            current_time += timedelta(minutes=self.slot_duration + self.buffer_time)
+        
+        return templates
         
     def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """This thread's persistent database connection, opened and tuned on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+    
+    def _ensure_indexes(self):
+        """Create the indexes behind the availability and calendar range queries if missing"""
+        try:
+            conn = self.get_db_connection()
+            # Covering index: the booked-slot lookup never touches the table
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_appt_doc_date "
+                "ON appointments(doctor_id, appointment_date, appointment_time)"
+            )
+            # Same name as the app's index, so whichever runs first wins
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_appt_date ON appointments(appointment_date)")
+            conn.commit()
+        except Exception as e:
+            print(f"Could not create calendar indexes: {e}")
+    
+    def _rollback(self):
+        """Roll back an unfinished transaction on this thread's connection after an error"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
     
     def generate_available_slots(self, doctor_id: str, start_date: str, days_ahead: int = 14) -> List[Dict]:
         """
@@ -56,95 +216,82 @@ class CalendarIntegration:
         Returns:
             List of available slots
         """
+        key = (doctor_id, start_date, days_ahead)
+        cached = _slot_cache.get(key)
+        if cached and cached[0] > monotonic():
+            return list(cached[1])
+        
+        generation = _slot_cache_generation
         try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            slots = []
-            
-            # Get existing appointments for this doctor
-            conn = self.get_db_connection()
-            existing_query = """
-                SELECT appointment_date, appointment_time 
-                FROM appointments 
-                WHERE doctor_id = ? AND appointment_date >= ?
-            """
-            existing_appointments = pd.read_sql_query(
-                existing_query, conn, params=[doctor_id, start_date]
-            )
-            conn.close()
-            
-            # Convert existing appointments to set for quick lookup
-            booked_slots = set()
-            for _, appt in existing_appointments.iterrows():
-                booked_slots.add(f"{appt['appointment_date']}_{appt['appointment_time']}")
-            
-            # Generate slots for each day
-            for day_offset in range(days_ahead):
-                current_date = start_dt + timedelta(days=day_offset)
-                
-                # Skip weekends if not in working days
-                if current_date.weekday() not in self.working_days:
-                    continue
-                
-                # Skip past dates
-                if current_date.date() < datetime.now().date():
-                    continue
-                
-                date_str = current_date.strftime('%Y-%m-%d')
-                day_slots = self._generate_day_slots(date_str, booked_slots)
-                slots.extend(day_slots)
-            
-            return slots
-            
+            slots = self._build_available_slots(doctor_id, start_date, days_ahead)
         except Exception as e:
             print(f"Error generating slots: {e}")
             return []
+        
+        with _slot_cache_lock:
+            if generation == _slot_cache_generation:
+                _slot_cache[key] = (monotonic() + SLOT_CACHE_TTL, slots)
+        return list(slots)
     
-    def _generate_day_slots(self, date_str: str, booked_slots: set) -> List[Dict]:
-        """Generate available slots for a specific day"""
+    def _build_available_slots(self, doctor_id: str, start_date: str, days_ahead: int) -> List[Dict]:
+        """Uncached slot generation behind generate_available_slots"""
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
         slots = []
-        current_time = datetime.combine(
-            datetime.strptime(date_str, '%Y-%m-%d').date(),
-            self.working_hours['start_time']
-        )
-        end_time = datetime.combine(
-            datetime.strptime(date_str, '%Y-%m-%d').date(),
-            self.working_hours['end_time']
-        )
-        lunch_start = datetime.combine(
-            datetime.strptime(date_str, '%Y-%m-%d').date(),
-            self.working_hours['lunch_start']
-        )
-        lunch_end = datetime.combine(
-            datetime.strptime(date_str, '%Y-%m-%d').date(),
-            self.working_hours['lunch_end']
-        )
         
-        while current_time + timedelta(minutes=self.slot_duration) <= end_time:
-            # Skip lunch hour
-            if lunch_start <= current_time < lunch_end:
-                current_time = lunch_end
-                continue
-            
-            time_str = current_time.strftime('%H:%M')
-            slot_key = f"{date_str}_{time_str}"
-            
-            # Check if slot is not booked
-            if slot_key not in booked_slots:
-                slots.append({
-                    'date': date_str,
-                    'time': time_str,
-                    'datetime': current_time.isoformat(),
-                    'day_name': current_time.strftime('%A'),
-                    'formatted_date': current_time.strftime('%B %d, %Y'),
-                    'formatted_time': current_time.strftime('%I:%M %p'),
-                    'slot_id': str(uuid.uuid4()),
-                    'available': True
-                })
-            
-            current_time += timedelta(minutes=self.slot_duration + self.buffer_time)
+        # Get existing appointments for this doctor
+        conn = self.get_db_connection()
+        existing_query = """
+            SELECT appointment_date, appointment_time 
+            FROM appointments 
+            WHERE doctor_id = ? AND appointment_date >= ?
+        """
+        rows = conn.execute(existing_query, (doctor_id, start_date)).fetchall()
+        
+        # Booked times grouped by date, so each day only checks its own (usually empty) set
+        booked_by_date = defaultdict(set)
+        for appt_date, appt_time in rows:
+            booked_by_date[appt_date].add(appt_time)
+        
+        # Working days in the range, skipping weekends and past dates
+        today = datetime.now().date()
+        days = [
+            current_date
+            for current_date in (start_dt + timedelta(days=day_offset) for day_offset in range(days_ahead))
+            if current_date.weekday() in self._working_days_set and current_date.date() >= today
+        ]
+        
+        # Generate slots for each day
+        for current_date in days:
+            booked_times = booked_by_date.get(current_date.strftime('%Y-%m-%d'), frozenset())
+            slots.extend(self._generate_day_slots(current_date, booked_times))
         
         return slots
     
+    def _generate_day_slots(self, day: datetime, booked_times: set) -> List[Dict]:
+        """Generate available slots for a specific day, given that day's booked HH:MM times"""
+        date_str = day.strftime('%Y-%m-%d')
+        day_name = day.strftime('%A')
+        formatted_date = day.strftime('%B %d, %Y')
+        
+        # Slots that are not booked; a day with no bookings takes every template
+        templates = self._slot_templates
+        if booked_times:
+            templates = [t for t in templates if t[0] not in booked_times]
+        
+        return [
+            {
+                'date': date_str,
+                'time': time_str,
+                'datetime': f"{date_str}T{iso_time}",
+                'day_name': day_name,
+                'formatted_date': formatted_date,
+                'formatted_time': formatted_time,
+                'slot_id': str(uuid.uuid4()),
+                'available': True
+            }
+            for time_str, iso_time, formatted_time in templates
+        ]
+    
     def get_doctor_availability(self, doctor_id: str, date_range: int = 14) -> Dict:
         """Get comprehensive availability for a doctor"""
         try:
@@ -160,15 +307,15 @@ class CalendarIntegration:
                 slots_by_date[date].append(slot)
             
             # Get doctor info with proper parameter order
-            conn = self.get_db_connection()
+            cursor = self.get_db_connection().cursor()
+            cursor.row_factory = sqlite3.Row
             doctor_query = "SELECT * FROM doctors WHERE doctor_id = ?"
-            doctor_info = pd.read_sql_query(doctor_query, conn, params=[doctor_id])
-            conn.close()
+            doctor_row = cursor.execute(doctor_query, (doctor_id,)).fetchone()
             
-            if doctor_info.empty:
+            if doctor_row is None:
                 return {'error': f'Doctor with ID {doctor_id} not found'}
             
-            doctor = doctor_info.iloc[0].to_dict()
+            doctor = dict(doctor_row)
             
             return {
                 'doctor': doctor,
@@ -188,88 +335,126 @@ class CalendarIntegration:
         Book an appointment slot (Calendly-style booking)
         
         Args:
-            slot_data: Dictionary containing booking information
+            slot_data: Dictionary containing booking information; an
+                'appointment_id' marks a row the caller has already inserted
             
         Returns:
             Booking confirmation data
         """
         try:
-            # Generate appointment ID
-            appointment_id = str(uuid.uuid4())[:8].upper()
+            appointment_id = slot_data.get('appointment_id')
             
-            # Save to database
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            
-            # Insert appointment
-            cursor.execute("""
-                INSERT INTO appointments (
-                    appointment_id, patient_id, doctor_id, appointment_date, 
-                    appointment_time, duration_minutes, appointment_type, 
-                    status, created_at, booking_method
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                appointment_id,
-                slot_data['patient_id'],
-                slot_data['doctor_id'],
-                slot_data['date'],
-                slot_data['time'],
-                slot_data.get('duration', self.slot_duration),
-                slot_data.get('appointment_type', 'consultation'),
-                'confirmed',
-                datetime.now().isoformat(),
-                'calendar_integration'
-            ))
+            if appointment_id is None:
+                # Save to database
+                conn = self.get_db_connection()
+                cursor = conn.execute(_SQL_INSERT_APPOINTMENT, self._appointment_row(slot_data))
+                appointment_id = cursor.lastrowid
+                
+                conn.commit()
+                invalidate_availability(slot_data['doctor_id'])
             
-            conn.commit()
-            conn.close()
+            # Generate calendar data for Excel export; the start/end datetimes are
+            # handed to the exporters directly so they don't re-parse the ISO strings
+            calendar_data, start_dt, end_dt = self._create_calendar_entry(appointment_id, slot_data)
             
-            # Generate calendar data for Excel export
-            calendar_data = self._create_calendar_entry(appointment_id, slot_data)
+            # Export to Excel in the background; the file name is known up front
+            excel_file = self._appointment_excel_filename(appointment_id)
+            excel_future = self._export_pool.submit(
+                self.export_appointment_to_calendar_excel, appointment_id, calendar_data, excel_file, start_dt
+            )
             
-            # Export to Excel
-            excel_file = self.export_appointment_to_calendar_excel(appointment_id, calendar_data)
+            # .ics invite alongside it, for iCal/Outlook
+            ics_file = f"{appointment_id}.ics"
+            self._export_pool.submit(self._write_ics, ics_file, calendar_data, start_dt, end_dt)
             
             return {
                 'success': True,
                 'appointment_id': appointment_id,
                 'booking_confirmation': calendar_data,
                 'excel_export': excel_file,
-                'calendar_link': self._generate_calendar_link(calendar_data),
+                'excel_export_future': excel_future,
+                'ics_export': ics_file,
                 'message': f'Appointment {appointment_id} successfully booked!'
             }
             
         except Exception as e:
+            self._rollback()
             return {
                 'success': False,
                 'error': f'Booking failed: {e}'
             }
     
-    def _create_calendar_entry(self, appointment_id: str, slot_data: Dict) -> Dict:
-        """Create calendar entry data"""
+    def book_calendly_slots(self, slot_data_list: List[Dict]) -> Dict:
+        """
+        Book many slots at once (imports, syncs) in a single transaction
+        
+        Skips the per-booking calendar entry and Excel export that
+        book_calendly_slot does; any failure rolls back the whole batch.
+        """
         try:
-            # Get additional details
+            # One transaction and one cached statement; execute() per row rather
+            # than executemany() so each autoincrement ID can be read back
             conn = self.get_db_connection()
+            appointment_ids = [
+                conn.execute(_SQL_INSERT_APPOINTMENT, self._appointment_row(slot_data)).lastrowid
+                for slot_data in slot_data_list
+            ]
+            conn.commit()
             
-            # Get patient info
-            patient_query = "SELECT * FROM patients WHERE patient_id = ?"
-            patient_info = pd.read_sql_query(patient_query, conn, params=[slot_data['patient_id']])
+            for doctor_id in {slot_data['doctor_id'] for slot_data in slot_data_list}:
+                invalidate_availability(doctor_id)
             
-            # Get doctor info
-            doctor_query = "SELECT * FROM doctors WHERE doctor_id = ?"
-            doctor_info = pd.read_sql_query(doctor_query, conn, params=[slot_data['doctor_id']])
+            return {
+                'success': True,
+                'appointment_ids': appointment_ids,
+                'message': f'{len(appointment_ids)} appointments successfully booked!'
+            }
             
-            conn.close()
+        except Exception as e:
+            self._rollback()
+            return {
+                'success': False,
+                'error': f'Bulk booking failed: {e}'
+            }
+    
+    def _appointment_row(self, slot_data: Dict) -> Tuple:
+        """Parameters for _SQL_INSERT_APPOINTMENT"""
+        return (
+            slot_data['patient_id'],
+            slot_data['doctor_id'],
+            slot_data['date'],
+            slot_data['time'],
+            slot_data.get('duration', self.slot_duration),
+            slot_data.get('appointment_type', 'consultation'),
+            'confirmed'
+        )
+    
+    def _create_calendar_entry(self, appointment_id: int, slot_data: Dict) -> Tuple[Dict, datetime, datetime]:
+        """Create calendar entry data; returns (entry, start datetime, end datetime)"""
+        try:
+            # Get additional details
+            conn = self.get_db_connection()
+            
+            # Patient and doctor in one round trip; the LEFT JOINs still yield a
+            # row (with NULLs) when either one is missing
+            (patient_id, first_name, last_name, email, phone,
+             doctor_id, doctor_name, specialty) = conn.execute("""
+                SELECT p.patient_id, p.first_name, p.last_name, p.email, p.phone,
+                       d.doctor_id, d.doctor_name, d.specialty
+                FROM (SELECT 1)
+                LEFT JOIN patients p ON p.patient_id = ?
+                LEFT JOIN doctors d ON d.doctor_id = ?
+            """, (slot_data['patient_id'], slot_data['doctor_id'])).fetchone()
             
             # Safely get data with defaults
             patient = {}
             doctor = {}
             
-            if not patient_info.empty:
-                patient = patient_info.iloc[0].to_dict()
+            if patient_id is not None:
+                patient = {'first_name': first_name, 'last_name': last_name, 'email': email, 'phone': phone}
             
-            if not doctor_info.empty:
-                doctor = doctor_info.iloc[0].to_dict()
+            if doctor_id is not None:
+                doctor = {'doctor_name': doctor_name, 'specialty': specialty}
             
             # Create datetime objects
             appointment_datetime = datetime.strptime(
@@ -298,11 +483,13 @@ class CalendarIntegration:
                 'timezone': 'Local Time'
             }
             
-            return calendar_entry
+            return calendar_entry, appointment_datetime, end_datetime
             
         except Exception as e:
             print(f"Error creating calendar entry: {e}")
             # Return a basic calendar entry as fallback
+            now = datetime.now()
+            end = now + timedelta(minutes=30)
             return {
                 'appointment_id': appointment_id,
                 'title': "Medical Appointment",
@@ -311,8 +498,8 @@ class CalendarIntegration:
                 'patient_name': "Unknown Patient",
                 'patient_email': 'no-email@example.com',
                 'patient_phone': '(000) 000-0000',
-                'start_datetime': datetime.now().isoformat(),
-                'end_datetime': (datetime.now() + timedelta(minutes=30)).isoformat(),
+                'start_datetime': now.isoformat(),
+                'end_datetime': end.isoformat(),
                 'date': slot_data.get('date', '2025-09-06'),
                 'time': slot_data.get('time', '09:00'),
                 'duration': "30 minutes",
@@ -321,13 +508,19 @@ class CalendarIntegration:
                 'status': 'confirmed',
                 'created_at': datetime.now().isoformat(),
                 'timezone': 'Local Time'
-            }
+            }, now, end
     
-    def export_appointment_to_calendar_excel(self, appointment_id: str, calendar_data: Dict) -> str:
+    def _appointment_excel_filename(self, appointment_id: int) -> str:
+        """File name (inside excel_export_path) for an appointment's calendar export"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"calendar_appointment_{appointment_id}_{timestamp}.xlsx"
+    
+    def export_appointment_to_calendar_excel(self, appointment_id: int, calendar_data: Dict,
+                                             filename: str = None, start_dt: datetime = None) -> str:
         """Export appointment to Excel with calendar-style formatting"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"calendar_appointment_{appointment_id}_{timestamp}.xlsx"
+            filename = filename or self._appointment_excel_filename(appointment_id)
+            start_dt = start_dt or datetime.fromisoformat(calendar_data['start_datetime'])
             filepath = os.path.join(self.excel_export_path, filename)
             
             # Create workbook and worksheet
@@ -339,12 +532,6 @@ class CalendarIntegration:
             header_font = Font(bold=True, size=14, color="FFFFFF")
             header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
             subheader_font = Font(bold=True, size=12)
-            border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
             
             # Title
             ws.merge_cells('A1:F1')
@@ -359,6 +546,7 @@ class CalendarIntegration:
             # Basic Info Section
             ws[f'A{row}'] = "APPOINTMENT DETAILS"
             ws[f'A{row}'].font = subheader_font
+            ws[f'A{row}'].border = _THIN_BORDER
             ws.merge_cells(f'A{row}:F{row}')
             row += 1
             
@@ -367,16 +555,17 @@ class CalendarIntegration:
                 ("Patient Name:", calendar_data['patient_name']),
                 ("Doctor:", calendar_data['doctor']),
                 ("Specialty:", calendar_data['specialty']),
-                ("Date:", datetime.fromisoformat(calendar_data['start_datetime']).strftime('%A, %B %d, %Y')),
+                ("Date:", start_dt.strftime('%A, %B %d, %Y')),
                 ("Time:", f"{calendar_data['time']} ({calendar_data['duration']})"),
                 ("Location:", calendar_data['location']),
                 ("Status:", calendar_data['status'].upper())
             ]
             
             for label, value in details:
-                ws[f'A{row}'] = label
-                ws[f'B{row}'] = value
-                ws[f'A{row}'].font = Font(bold=True)
+                label_cell = ws.cell(row=row, column=1, value=label)
+                label_cell.font = _BOLD_FONT
+                label_cell.border = _THIN_BORDER
+                ws.cell(row=row, column=2, value=value).border = _THIN_BORDER
                 row += 1
             
             row += 1
@@ -384,6 +573,7 @@ class CalendarIntegration:
             # Contact Information
             ws[f'A{row}'] = "CONTACT INFORMATION"
             ws[f'A{row}'].font = subheader_font
+            ws[f'A{row}'].border = _THIN_BORDER
             ws.merge_cells(f'A{row}:F{row}')
             row += 1
             
@@ -395,9 +585,10 @@ class CalendarIntegration:
             ]
             
             for label, value in contact_info:
-                ws[f'A{row}'] = label
-                ws[f'B{row}'] = value
-                ws[f'A{row}'].font = Font(bold=True)
+                label_cell = ws.cell(row=row, column=1, value=label)
+                label_cell.font = _BOLD_FONT
+                label_cell.border = _THIN_BORDER
+                ws.cell(row=row, column=2, value=value).border = _THIN_BORDER
                 row += 1
             
             row += 2
@@ -405,6 +596,7 @@ class CalendarIntegration:
             # Calendar Instructions
             ws[f'A{row}'] = "CALENDAR INTEGRATION"
             ws[f'A{row}'].font = subheader_font
+            ws[f'A{row}'].border = _THIN_BORDER
             ws.merge_cells(f'A{row}:F{row}')
             row += 1
             
@@ -417,18 +609,13 @@ class CalendarIntegration:
             ]
             
             for instruction in instructions:
-                ws[f'A{row}'] = instruction
+                ws.cell(row=row, column=1, value=instruction).border = _THIN_BORDER
                 row += 1
             
             row += 2
             
             # Quick Calendar View (Mini Calendar)
-            self._add_mini_calendar(ws, row, calendar_data)
-            
-            # Apply borders and formatting
-            for row_cells in ws.iter_rows(min_row=3, max_row=row+10, min_col=1, max_col=6):
-                for cell in row_cells:
-                    cell.border = border
+            self._add_mini_calendar(ws, row, start_dt)
             
             # Adjust column widths
             ws.column_dimensions['A'].width = 20
@@ -447,41 +634,43 @@ class CalendarIntegration:
             print(f"Error exporting to Excel: {e}")
             return None
     
-    def _add_mini_calendar(self, ws, start_row: int, calendar_data: Dict):
+    def _add_mini_calendar(self, ws, start_row: int, appointment_date: datetime):
         """Add a mini calendar view to the Excel sheet"""
         try:
-            appointment_date = datetime.fromisoformat(calendar_data['start_datetime'])
             year = appointment_date.year
             month = appointment_date.month
             
             # Calendar header
             ws[f'A{start_row}'] = "CALENDAR VIEW"
             ws[f'A{start_row}'].font = Font(bold=True, size=12)
+            ws[f'A{start_row}'].border = _THIN_BORDER
             ws.merge_cells(f'A{start_row}:G{start_row}')
             start_row += 1
             
-            # Month and year
-            month_name = calendar.month_name[month]
+            # Month and year (grid is cached per month across exports)
+            month_name, cal = _month_grid(year, month)
             ws[f'A{start_row}'] = f"{month_name} {year}"
-            ws[f'A{start_row}'].font = Font(bold=True)
+            ws[f'A{start_row}'].font = _BOLD_FONT
+            ws[f'A{start_row}'].border = _THIN_BORDER
             ws.merge_cells(f'A{start_row}:G{start_row}')
             start_row += 1
             
             # Day headers
             days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
             for i, day in enumerate(days):
-                ws.cell(row=start_row, column=i+1, value=day)
-                ws.cell(row=start_row, column=i+1).font = Font(bold=True)
+                cell = ws.cell(row=start_row, column=i+1, value=day)
+                cell.font = _BOLD_FONT
+                cell.border = _THIN_BORDER
             start_row += 1
             
             # Calendar grid
-            cal = calendar.monthcalendar(year, month)
             for week in cal:
                 for i, day in enumerate(week):
                     if day == 0:
-                        ws.cell(row=start_row, column=i+1, value="")
+                        ws.cell(row=start_row, column=i+1, value="").border = _THIN_BORDER
                     else:
                         cell = ws.cell(row=start_row, column=i+1, value=day)
+                        cell.border = _THIN_BORDER
                         # Highlight appointment day
                         if day == appointment_date.day:
                             cell.fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
@@ -491,74 +680,48 @@ class CalendarIntegration:
         except Exception as e:
             print(f"Error adding mini calendar: {e}")
     
-    def _generate_calendar_link(self, calendar_data: Dict) -> str:
-        """Generate calendar link for external calendar applications"""
-        # Simple calendar link (can be enhanced for specific calendar apps)
-        start_time = calendar_data['start_datetime'].replace(':', '%3A')
-        end_time = calendar_data['end_datetime'].replace(':', '%3A')
-        
-        # Google Calendar link format
-        google_calendar_link = (
-            f"https://calendar.google.com/calendar/render?action=TEMPLATE"
-            f"&text={calendar_data['title'].replace(' ', '%20')}"
-            f"&dates={start_time.replace('-', '').replace(':', '')}Z/"
-            f"{end_time.replace('-', '').replace(':', '')}Z"
-            f"&details={calendar_data['description'].replace(' ', '%20')}"
-            f"&location={calendar_data['location'].replace(' ', '%20')}"
-        )
+    def _generate_ics(self, calendar_data: Dict, start_dt: datetime = None, end_dt: datetime = None) -> bytes:
+        """Build an iCalendar (.ics) file for an appointment"""
+        def escape(text) -> str:
+            # RFC 5545 TEXT escaping
+            return (str(text).replace('\\', '\\\\').replace(';', '\\;')
+                    .replace(',', '\\,').replace('\n', '\\n'))
         
-        return google_calendar_link
+        start_dt = start_dt or datetime.fromisoformat(calendar_data['start_datetime'])
+        end_dt = end_dt or datetime.fromisoformat(calendar_data['end_datetime'])
+        return _ICS_TEMPLATE.format_map({
+            'uid': f"{calendar_data['appointment_id']}@medicare-scheduler",
+            'stamp': f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}Z",
+            'start': f"{start_dt:%Y%m%dT%H%M%S}",
+            'end': f"{end_dt:%Y%m%dT%H%M%S}",
+            'summary': escape(calendar_data['title']),
+            'description': escape(calendar_data['description']),
+            'location': escape(calendar_data['location'])
+        }).encode('utf-8')
     
-    def get_all_appointments_calendar(self, start_date: str = None, end_date: str = None) -> Dict:
-        """Get all appointments in calendar format"""
+    def _write_ics(self, filename: str, calendar_data: Dict,
+                   start_dt: datetime = None, end_dt: datetime = None) -> Optional[str]:
+        """Write an appointment's .ics file into excel_export_path"""
         try:
-            conn = self.get_db_connection()
-            
-            # Build query
-            base_query = """
-                SELECT a.*, p.first_name, p.last_name, p.email, p.phone,
-                       d.doctor_name, d.specialty
-                FROM appointments a
-                LEFT JOIN patients p ON a.patient_id = p.patient_id
-                LEFT JOIN doctors d ON a.doctor_id = d.doctor_id
-            """
-            
-            params = []
-            if start_date and end_date:
-                base_query += " WHERE a.appointment_date BETWEEN ? AND ?"
-                params = [start_date, end_date]
-            elif start_date:
-                base_query += " WHERE a.appointment_date >= ?"
-                params = [start_date]
-            
-            base_query += " ORDER BY a.appointment_date, a.appointment_time"
-            
-            appointments_df = pd.read_sql_query(base_query, conn, params=params)
-            conn.close()
-            
-            # Convert to calendar format
-            calendar_events = []
-            for _, appt in appointments_df.iterrows():
-                # Create datetime
-                appt_datetime = datetime.strptime(
-                    f"{appt['appointment_date']} {appt['appointment_time']}", 
-                    "%Y-%m-%d %H:%M"
-                )
-                end_datetime = appt_datetime + timedelta(minutes=appt.get('duration_minutes', 30))
-                
-                event = {
-                    'id': appt['appointment_id'],
-                    'title': f"{appt['first_name']} {appt['last_name']} - Dr. {appt['doctor_name']}",
-                    'start': appt_datetime.isoformat(),
-                    'end': end_datetime.isoformat(),
-                    'description': f"Patient: {appt['first_name']} {appt['last_name']}\nDoctor: Dr. {appt['doctor_name']}\nSpecialty: {appt['specialty']}",
-                    'location': "MediCare Allergy & Wellness Center",
-                    'status': appt.get('status', 'confirmed'),
-                    'patient_email': appt.get('email', ''),
-                    'patient_phone': appt.get('phone', ''),
-                    'doctor_specialty': appt.get('specialty', '')
-                }
-                calendar_events.append(event)
+            with open(os.path.join(self.excel_export_path, filename), 'wb') as f:
+                f.write(self._generate_ics(calendar_data, start_dt, end_dt))
+            return filename
+        except Exception as e:
+            print(f"Error writing calendar invite: {e}")
+            return None
+    
+    def get_all_appointments_calendar(self, start_date: str = None, end_date: str = None, stream: bool = False):
+        """
+        Get all appointments in calendar format
+        
+        With stream=True, returns a generator of event dicts read straight off the
+        cursor instead of the summary dict, so large ranges are never held in memory.
+        """
+        if stream:
+            return self._iter_calendar_events(start_date, end_date)
+        
+        try:
+            calendar_events = list(self._iter_calendar_events(start_date, end_date))
             
             return {
                 'success': True,
@@ -573,96 +736,145 @@ class CalendarIntegration:
                 'error': f'Error retrieving calendar: {e}'
             }
     
-    def export_full_calendar_excel(self, start_date: str = None, end_date: str = None) -> str:
-        """Export full calendar to Excel with professional formatting"""
+    def _calendar_rows(self, start_date: str = None, end_date: str = None):
+        """
+        Cursor over appointments in the date range, in date/time order
+        
+        Columns: appointment_id, status, date, time, ISO start, ISO end, patient
+        first/last name, email, phone, doctor_name, specialty. SQLite formats the
+        dates and times so rows need no datetime parsing.
+        """
+        conn = self.get_db_connection()
+        
+        # Build query
+        base_query = """
+            SELECT a.appointment_id, a.status,
+                   a.appointment_date,
+                   strftime('%H:%M', a.appointment_date || ' ' || a.appointment_time),
+                   strftime('%Y-%m-%dT%H:%M:%S', a.appointment_date || ' ' || a.appointment_time),
+                   strftime('%Y-%m-%dT%H:%M:%S', a.appointment_date || ' ' || a.appointment_time, ?),
+                   p.first_name, p.last_name, p.email, p.phone,
+                   d.doctor_name, d.specialty
+            FROM appointments a
+            LEFT JOIN patients p ON a.patient_id = p.patient_id
+            LEFT JOIN doctors d ON a.doctor_id = d.doctor_id
+        """
+        
+        where, params = self._calendar_range_filter(start_date, end_date)
+        base_query += where + " ORDER BY a.appointment_date, a.appointment_time"
+        
+        return conn.execute(base_query, [f"+{CALENDAR_EVENT_MINUTES} minutes"] + params)
+    
+    def _calendar_range_filter(self, start_date: str = None, end_date: str = None) -> Tuple[str, List]:
+        """WHERE clause and parameters limiting appointments to the date range"""
+        if start_date and end_date:
+            return " WHERE a.appointment_date BETWEEN ? AND ?", [start_date, end_date]
+        if start_date:
+            return " WHERE a.appointment_date >= ?", [start_date]
+        return "", []
+    
+    def _calendar_column_widths(self, start_date: str = None, end_date: str = None) -> List[int]:
+        """Export column widths sized to the longest value in the range (capped at 50)"""
+        where, params = self._calendar_range_filter(start_date, end_date)
+        lengths = list(self.get_db_connection().execute(_SQL_CALENDAR_COLUMN_LENGTHS + where, params).fetchone())
+        lengths[_CALENDAR_EXPORT_HEADERS.index("Duration")] = len(f"{CALENDAR_EVENT_MINUTES} min")
+        return [
+            min(max(len(header), length or 0) + 2, 50)
+            for header, length in zip(_CALENDAR_EXPORT_HEADERS, lengths)
+        ]
+    
+    def _iter_calendar_events(self, start_date: str = None, end_date: str = None):
+        """Yield calendar events for appointments in the date range, in date/time order"""
+        # Convert to calendar format
+        for (appointment_id, status, _date, _time, start, end,
+             first_name, last_name, email, phone,
+             doctor_name, specialty) in self._calendar_rows(start_date, end_date):
+            yield {
+                'id': appointment_id,
+                'title': f"{first_name} {last_name} - Dr. {doctor_name}",
+                'start': start,
+                'end': end,
+                'description': f"Patient: {first_name} {last_name}\nDoctor: Dr. {doctor_name}\nSpecialty: {specialty}",
+                'location': "MediCare Allergy & Wellness Center",
+                'status': status,
+                'patient_email': email,
+                'patient_phone': phone,
+                'doctor_specialty': specialty
+            }
+    
+    def export_full_calendar_excel(self, start_date: str = None, end_date: str = None) -> Optional[Tuple[str, io.BytesIO]]:
+        """Export full calendar to an in-memory Excel workbook; returns (filename, buffer)"""
         try:
-            calendar_data = self.get_all_appointments_calendar(start_date, end_date)
-            
-            if not calendar_data['success']:
-                return None
-            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"medical_calendar_export_{timestamp}.xlsx"
-            filepath = os.path.join(self.excel_export_path, filename)
             
-            # Create workbook
-            workbook = openpyxl.Workbook()
-            ws = workbook.active
-            ws.title = "Medical Calendar"
+            # Write-only workbook: rows are streamed out instead of kept as Cell objects
+            workbook = openpyxl.Workbook(write_only=True)
+            ws = workbook.create_sheet("Medical Calendar")
             
             # Styles
             header_font = Font(bold=True, size=12, color="FFFFFF")
             header_fill = PatternFill(start_color="2F75B5", end_color="2F75B5", fill_type="solid")
-            border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            # Headers
-            headers = [
-                "Appointment ID", "Date", "Time", "Patient Name", "Patient Email", 
-                "Patient Phone", "Doctor", "Specialty", "Duration", "Status"
-            ]
+            # Color code by status
+            status_fills = {
+                'confirmed': PatternFill(start_color="E6F3E6", end_color="E6F3E6", fill_type="solid"),
+                'pending': PatternFill(start_color="FFF2E6", end_color="FFF2E6", fill_type="solid"),
+                'cancelled': PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid"),
+            }
             
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
+            # Column widths; write-only sheets need them before any row is written,
+            # so a cheap aggregate over the range sizes them up front
+            widths = self._calendar_column_widths(start_date, end_date)
+            header_cells = []
+            for col, (header, width) in enumerate(zip(_CALENDAR_EXPORT_HEADERS, widths), 1):
+                ws.column_dimensions[get_column_letter(col)].width = width
+                cell = WriteOnlyCell(ws, value=header)
                 cell.font = header_font
                 cell.fill = header_fill
-                cell.border = border
-            
-            # Data rows
-            for row, event in enumerate(calendar_data['events'], 2):
-                start_time = datetime.fromisoformat(event['start'])
-                end_time = datetime.fromisoformat(event['end'])
-                duration = int((end_time - start_time).total_seconds() / 60)
-                
+                cell.border = _THIN_BORDER
+                header_cells.append(cell)
+            ws.append(header_cells)
+            
+            # Data rows, written as they come off the cursor
+            duration = f"{CALENDAR_EVENT_MINUTES} min"
+            total = 0
+            for (appointment_id, status, appt_date, appt_time, _start, _end,
+                 first_name, last_name, email, phone,
+                 doctor_name, specialty) in self._calendar_rows(start_date, end_date):
                 row_data = [
-                    event['id'],
-                    start_time.strftime('%Y-%m-%d'),
-                    start_time.strftime('%H:%M'),
-                    event['title'].split(' - ')[0],  # Patient name
-                    event['patient_email'],
-                    event['patient_phone'],
-                    event['title'].split(' - ')[1] if ' - ' in event['title'] else '',  # Doctor
-                    event['doctor_specialty'],
-                    f"{duration} min",
-                    event['status'].title()
+                    appointment_id,
+                    appt_date,
+                    appt_time,
+                    f"{first_name} {last_name}",
+                    email,
+                    phone,
+                    f"Dr. {doctor_name}",
+                    specialty,
+                    duration,
+                    (status or '').title()
                 ]
                 
-                for col, value in enumerate(row_data, 1):
-                    cell = ws.cell(row=row, column=col, value=value)
-                    cell.border = border
-                    
-                    # Color code by status
-                    if event['status'] == 'confirmed':
-                        cell.fill = PatternFill(start_color="E6F3E6", end_color="E6F3E6", fill_type="solid")
-                    elif event['status'] == 'pending':
-                        cell.fill = PatternFill(start_color="FFF2E6", end_color="FFF2E6", fill_type="solid")
-                    elif event['status'] == 'cancelled':
-                        cell.fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
-            
-            # Auto-adjust column widths
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+                fill = status_fills.get(status)
+                row_cells = []
+                for value in row_data:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.border = _THIN_BORDER
+                    if fill is not None:
+                        cell.fill = fill
+                    row_cells.append(cell)
+                ws.append(row_cells)
+                total += 1
             
             # Add summary
-            summary_row = len(calendar_data['events']) + 3
-            ws[f'A{summary_row}'] = f"Total Appointments: {calendar_data['total_appointments']}"
-            ws[f'A{summary_row}'].font = Font(bold=True)
+            ws.append([])
+            summary_cell = WriteOnlyCell(ws, value=f"Total Appointments: {total}")
+            summary_cell.font = _BOLD_FONT
+            ws.append([summary_cell])
             
-            workbook.save(filepath)
-            return filename
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+            buffer.seek(0)
+            return filename, buffer
             
         except Exception as e:
             print(f"Error exporting calendar to Excel: {e}")
@@ -694,6 +906,7 @@ if __name__ == "__main__":
     # Test calendar export
     export_file = calendar_system.export_full_calendar_excel()
     if export_file:
-        print(f"✅ Calendar exported to: {export_file}")
+        filename, buffer = export_file
+        print(f"✅ Calendar exported: {filename} ({buffer.getbuffer().nbytes} bytes)")
     else:
         print("❌ Calendar export failed")
@@ -1,15 +1,30 @@
 import smtplib
 import os
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
+from contextlib import contextmanager
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from dotenv import load_dotenv
 from datetime import datetime
 
 load_dotenv()
 
+# Emails sent over one SMTP connection before reconnecting; providers drop or
+# throttle sessions that stay open for too many messages
+MAX_MESSAGES_PER_SMTP_SESSION = 100
+
+# SMTP replies that usually mean "busy/throttled, try again shortly"
+TRANSIENT_SMTP_CODES = {421, 450}
+SMTP_SEND_ATTEMPTS = 3
+
+# One pooled HTTPS session to the Twilio API shared by every CommunicationManager,
+# so SMS sends reuse a kept-alive TLS connection instead of handshaking per manager
+_TWILIO_HTTP_CLIENT = TwilioHttpClient(pool_connections=True)
+
 class CommunicationManager:
     def __init__(self):
         # Email configuration
@@ -24,11 +39,36 @@ class CommunicationManager:
         self.twilio_phone_number = os.getenv('TWILIO_PHONE_NUMBER')
         
         # Initialize Twilio client
+        self.twilio_client = None
         if self.twilio_account_sid and self.twilio_auth_token:
-            self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
+            self.twilio_client = Client(
+                self.twilio_account_sid, self.twilio_auth_token, http_client=_TWILIO_HTTP_CLIENT
+            )
         
+    @contextmanager
+    def smtp_session(self):
+        """Open one authenticated SMTP connection for a batch of emails"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.email_user, self.email_password)
+            yield server
+        finally:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                server.close()
+    
     def send_email(self, to_email: str, subject: str, body: str, attachment_path: str = None):
         """Send email with optional attachment"""
+        try:
+            with self.smtp_session() as server:
+                return self.send_email_on(server, to_email, subject, body, attachment_path)
+        except Exception as e:
+            return False, f"Error sending email: {str(e)}"
+    
+    def send_email_on(self, server, to_email: str, subject: str, body: str, attachment_path: str = None):
+        """Send email over an already open SMTP session (see smtp_session)"""
         try:
             # Create message
             msg = MIMEMultipart()
@@ -52,13 +92,16 @@ class CommunicationManager:
                 )
                 msg.attach(part)
             
-            # Connect to server and send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
             text = msg.as_string()
-            server.sendmail(self.email_user, to_email, text)
-            server.quit()
+            for attempt in range(SMTP_SEND_ATTEMPTS):
+                try:
+                    server.sendmail(self.email_user, to_email, text)
+                    break
+                except smtplib.SMTPResponseException as e:
+                    if e.smtp_code not in TRANSIENT_SMTP_CODES or attempt == SMTP_SEND_ATTEMPTS - 1:
+                        raise
+                    # Exponential backoff: 1s, 2s, ...
+                    time.sleep(2 ** attempt)
             
             return True, "Email sent successfully"
             
@@ -168,6 +168,12 @@ class DatabaseManager:
             )
         """)
         
+        # Indexes for the reminder dashboard: pending/sent lookups by time and
+        # upcoming confirmed appointments by date
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_reminders_status_sched ON reminders(status, scheduled_time)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_reminders_status_sent ON reminders(status, sent_time)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_appt_date_status ON appointments(appointment_date, status)")
+        
         conn.commit()
         conn.close()
         print("Database initialized successfully")
@@ -17,7 +17,7 @@ from langchain.schema import HumanMessage, SystemMessage
 
 # Calendar Integration import
 try:
-    from calendar_integration import CalendarIntegration
+    from calendar_integration import CalendarIntegration, invalidate_availability
     CALENDAR_AVAILABLE = True
 except ImportError:
     CALENDAR_AVAILABLE = False
@@ -352,10 +352,15 @@ class EnhancedMedicalAgent:
             
             conn.commit()
             
+            # The slot is taken: drop cached availability for this doctor right away
+            if CALENDAR_AVAILABLE:
+                invalidate_availability(doctor_id)
+            
             # 🗓️ CALENDAR INTEGRATION: Export to Excel with calendar formatting
             if self.calendar_system:
                 try:
                     slot_data = {
+                        'appointment_id': appointment_id,
                         'patient_id': patient_id,
                         'doctor_id': doctor_id,
                         'date': date,
@@ -364,7 +369,8 @@ class EnhancedMedicalAgent:
                         'appointment_type': appointment_type
                     }
                     
-                    # Create calendar entry and export to Excel
+                    # Create calendar entry and export to Excel; the appointment
+                    # row above already exists, so this doesn't insert another
                     calendar_result = self.calendar_system.book_calendly_slot(slot_data)
                     
                     if calendar_result.get('success'):
@@ -372,7 +378,7 @@ class EnhancedMedicalAgent:
                         # Store calendar info in conversation context for later use
                         if hasattr(self, 'conversation_context'):
                             self.conversation_context['calendar_export'] = calendar_result['excel_export']
-                            self.conversation_context['calendar_link'] = calendar_result.get('calendar_link')
+                            self.conversation_context['calendar_invite'] = calendar_result.get('ics_export')
                     else:
                         print(f"⚠️  Calendar integration failed: {calendar_result.get('error')}")
                         
@@ -0,0 +1,166 @@
+"""
+Regression checks for the batched reminder sender's status bookkeeping
+
+Run from the repository root: python -m unittest discover tests
+"""
+
+import contextlib
+import importlib.util
+import os
+import smtplib
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HAS_DEPS = all(importlib.util.find_spec(name) for name in ("twilio", "dotenv"))
+
+SCHEMA = """
+    CREATE TABLE patients (patient_id TEXT, first_name TEXT, last_name TEXT, email TEXT, phone TEXT);
+    CREATE TABLE doctors (doctor_id TEXT, doctor_name TEXT, specialty TEXT);
+    CREATE TABLE appointments (
+        appointment_id INTEGER PRIMARY KEY, patient_id TEXT, doctor_id TEXT,
+        appointment_date TEXT, appointment_time TEXT
+    );
+    CREATE TABLE reminders (
+        reminder_id INTEGER PRIMARY KEY, appointment_id INTEGER, patient_id TEXT,
+        reminder_type TEXT, reminder_method TEXT, scheduled_time TEXT,
+        status TEXT, sent_time TEXT, response TEXT
+    );
+    INSERT INTO patients VALUES ('P1', 'Jane', 'Doe', 'jane@example.com', NULL);
+    INSERT INTO doctors VALUES ('DR001', 'Emily Chen', 'Allergy & Immunology');
+    INSERT INTO appointments VALUES (1, 'P1', 'DR001', '2030-01-01', '09:00');
+"""
+
+
+class FakeSMTP:
+    """SMTP session stand-in that refuses or drops on chosen messages"""
+
+    def __init__(self, state):
+        self.state = state
+        self.dead = False
+
+    def sendmail(self, from_addr, to_addr, msg):
+        if self.dead:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.state["attempts"] += 1
+        if self.state["attempts"] in self.state["refuse"]:
+            raise smtplib.SMTPRecipientsRefused({to_addr: (550, b"No such user")})
+        if self.state["attempts"] in self.state["drop"]:
+            self.dead = True
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+    def noop(self):
+        if self.dead:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return 250, b"OK"
+
+
+@unittest.skipUnless(HAS_DEPS, "twilio and python-dotenv are required")
+class ReminderStatusTest(unittest.TestCase):
+    def setUp(self):
+        import automated_reminder_system
+
+        self.module = automated_reminder_system
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+
+        self.state = {"attempts": 0, "refuse": set(), "drop": set()}
+
+        @contextlib.contextmanager
+        def smtp_session(manager):
+            yield FakeSMTP(self.state)
+
+        patches = [
+            mock.patch.object(self.module.CommunicationManager, "smtp_session", smtp_session),
+            mock.patch.object(self.module, "REMINDER_CONCURRENCY", 1),
+            mock.patch("builtins.print"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.system = self.module.AutomatedReminderSystem(db_path=self.db_path)
+        self.system.debug_mode = False
+        self.system.test_email_config = lambda: True
+
+    def tearDown(self):
+        self.system._io_pool.shutdown()
+        conn = getattr(self.system._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        os.remove(self.db_path)
+
+    def add_reminders(self, count):
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO reminders (appointment_id, patient_id, reminder_type, reminder_method, scheduled_time, status) "
+            "VALUES (1, 'P1', 'initial', 'email', '2020-01-01 00:00:00', 'pending')",
+            [()] * count,
+        )
+        conn.commit()
+        conn.close()
+
+    def statuses(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT reminder_id, status FROM reminders ORDER BY reminder_id").fetchall()
+        conn.close()
+        return dict(rows)
+
+    def test_refused_send_is_marked_failed(self):
+        self.add_reminders(3)
+        self.state["refuse"] = {2}
+
+        self.system.check_and_send_reminders()
+
+        self.assertEqual(self.statuses(), {1: "sent", 2: "failed", 3: "sent"})
+
+    def test_dropped_session_reconnects_and_retries(self):
+        self.add_reminders(3)
+        self.state["drop"] = {2}
+
+        self.system.check_and_send_reminders()
+
+        self.assertEqual(self.statuses(), {1: "sent", 2: "sent", 3: "sent"})
+
+    def test_unrecoverable_drop_leaves_rest_pending(self):
+        self.add_reminders(4)
+        # Every session drops on its second message
+        self.state["drop"] = {2, 3, 4, 5, 6, 7, 8}
+        self.state["refuse"] = set()
+
+        self.system.check_and_send_reminders()
+
+        statuses = self.statuses()
+        self.assertNotIn("failed", statuses.values())
+        self.assertEqual(statuses[1], "sent")
+        self.assertIn("pending", statuses.values())
+
+    def test_retried_final_reminder_texts_once(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE patients SET phone = '+15550100' WHERE patient_id = 'P1'")
+        conn.execute(
+            "INSERT INTO reminders (appointment_id, patient_id, reminder_type, reminder_method, scheduled_time, status) "
+            "VALUES (1, 'P1', 'follow_up_2', 'email', '2020-01-01 00:00:00', 'pending')"
+        )
+        conn.commit()
+        conn.close()
+        self.state["drop"] = {1}
+
+        with mock.patch.object(self.system, "send_sms_reminder", return_value=True) as send_sms:
+            self.system.check_and_send_reminders()
+
+        self.assertEqual(self.statuses(), {1: "sent"})
+        self.assertEqual(self.state["attempts"], 2)
+        send_sms.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Booking inserts checked against the schema DatabaseManager creates
+
+Run from the repository root: python -m unittest discover tests
+"""
+
+import importlib.util
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HAS_DEPS = all(importlib.util.find_spec(name) for name in ("openpyxl", "pandas"))
+
+
+@unittest.skipUnless(HAS_DEPS, "openpyxl and pandas are required")
+class BookingInsertTest(unittest.TestCase):
+    def setUp(self):
+        import calendar_integration
+        from database_manager import DatabaseManager
+
+        patch = mock.patch("builtins.print")
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        # Both classes use paths relative to the working directory
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        os.chdir(self.workdir)
+        self.addCleanup(os.chdir, ROOT)
+
+        DatabaseManager()
+        self.db_path = os.path.join(self.workdir, "data", "medical_scheduler.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO patients (patient_id, first_name, last_name, date_of_birth, email) "
+                     "VALUES ('P1', 'Jane', 'Doe', '1990-05-01', 'jane@example.com')")
+        conn.execute("INSERT INTO doctors (doctor_id, doctor_name, specialty) "
+                     "VALUES ('DR001', 'Emily Chen', 'Allergy & Immunology')")
+        conn.commit()
+        conn.close()
+
+        self.calendar = calendar_integration.CalendarIntegration()
+
+    def tearDown(self):
+        self.calendar._export_pool.shutdown()
+        conn = getattr(self.calendar._local, "conn", None)
+        if conn is not None:
+            conn.close()
+
+    def slot(self, time):
+        return {"patient_id": "P1", "doctor_id": "DR001", "date": "2030-01-07", "time": time}
+
+    def appointments(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            "SELECT appointment_id, appointment_time, duration, status, created_at "
+            "FROM appointments ORDER BY appointment_id"
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def test_book_calendly_slots_inserts_every_row(self):
+        result = self.calendar.book_calendly_slots([self.slot("09:00"), self.slot("09:30")])
+
+        self.assertTrue(result["success"], result.get("error"))
+        rows = self.appointments()
+        self.assertEqual([row[0] for row in rows], result["appointment_ids"])
+        self.assertEqual([row[1:4] for row in rows], [("09:00", 30, "confirmed"), ("09:30", 30, "confirmed")])
+        self.assertTrue(all(row[4] for row in rows))
+
+    def test_book_calendly_slot_inserts_once(self):
+        result = self.calendar.book_calendly_slot(self.slot("10:00"))
+        result["excel_export_future"].result()
+
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertEqual([row[0] for row in self.appointments()], [result["appointment_id"]])
+
+    def test_book_calendly_slot_reuses_existing_appointment(self):
+        slot = dict(self.slot("10:30"), appointment_id=42)
+
+        result = self.calendar.book_calendly_slot(slot)
+        result["excel_export_future"].result()
+
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertEqual(result["appointment_id"], 42)
+        self.assertEqual(self.appointments(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()